@@ -3,6 +3,7 @@ import { createRouter, createWebHistory, RouteLocationNormalized } from 'vue-rou
 import { createResource } from 'frappe-ui'
 
 import { session } from '@/stores/session'
+import { getPresentationBootstrap } from '@/stores/presentation'
 
 const withPresentationProps = (route: RouteLocationNormalized) => {
 	const slide = parseInt(route.query.slide as string)
@@ -51,59 +52,27 @@ let router = createRouter({
 	routes,
 })
 
-const hasAccess = async (presentationId: string) => {
-	if (!session.isLoggedIn) return false
-	try {
-		const response = await createResource({
-			url: "frappe.client.has_permission",
-			method: "GET",
-		}).submit({
-			doctype: "Presentation",
-			docname: presentationId,
-			perm_type: "write",
-		})
-		return response.has_permission
-	} catch (error) {
-		console.error('Permission check failed:', error)
-		return false
-	}
-}
-
-const isPublicPresentation = async (presentationId: string) => {
-	try {
-		const response = await createResource({
-			url: "slides.slides.doctype.presentation.presentation.is_public_presentation",
-			method: "GET",
-		}).submit({
-			doctype: "Presentation",
-			name: presentationId,
-		})
-		return response
-	} catch (error) {
-		console.error('Failed to fetch presentation access level:', error)
-		return false
-	}
-}
+const defaultAccess = { is_public: false, is_composite: false, can_write: false }
 
-const isCompositePresentation = async (presentationId: string) => {
+const getPresentationAccess = async (presentationId: string, withSlides: boolean) => {
 	try {
-		const response = await createResource({
-			url: "slides.slides.doctype.presentation.presentation.is_composite_presentation",
-			method: "GET",
-		}).submit({
-			doctype: "Presentation",
-			name: presentationId,
-		})
-		return response
+		const response = withSlides
+			? (await getPresentationBootstrap(presentationId)).access
+			: await createResource({
+					url: "slides.slides.doctype.presentation.presentation.get_presentation_access",
+					method: "GET",
+				}).submit({
+					name: presentationId,
+				})
+		return response || defaultAccess
 	} catch (error) {
 		console.error('Failed to fetch presentation access level:', error)
-		return false
+		return defaultAccess
 	}
 }
 
 let previousRoute = null
-let canAccess = false
-let isComposite = false
+let access = defaultAccess
 
 
 router.beforeEach(async (to, from, next) => {
@@ -123,10 +92,13 @@ router.beforeEach(async (to, from, next) => {
 	if (['Slideshow', 'PresentationView', 'PresentationEditor'].includes(to.name as string)) {
 
 		if (from.name != to.name || from.params.presentationId != to.params.presentationId) {
-			isComposite = await isCompositePresentation(to.params.presentationId as string)
-			canAccess = await hasAccess(to.params.presentationId as string)
+			// guests can only view, so the slides fetched along with the access level are always used
+			const isGuestViewer =
+				!isLoggedIn && ['Slideshow', 'PresentationView'].includes(to.name as string)
+			access = await getPresentationAccess(to.params.presentationId as string, isGuestViewer)
 		}
-		if (isComposite) {
+		const canAccess = session.isLoggedIn && access.can_write
+		if (access.is_composite) {
 			if (to.name == 'Slideshow' || to.name == 'PresentationView') {
 				return next()
 			} else {
@@ -143,7 +115,7 @@ router.beforeEach(async (to, from, next) => {
 			return next({ name: 'PresentationEditor', params: to.params, query: to.query } )
 		}
 		else {
-			const isPublic = await isPublicPresentation(to.params.presentationId as string)
+			const isPublic = access.is_public
 			if (isPublic && ['Slideshow', 'PresentationView'].includes(to.name as string)) {
 				if (to.name === 'Slideshow' && !from.name) {
 					return next({ name: 'PresentationView', params: to.params, query: to.query } )
@@ -9,6 +9,7 @@ import {
 	currentSlide,
 	slideIndex,
 	updateThumbnail,
+	focusedSlide,
 } from './slide'
 import { useTextEditor } from '@/composables/useTextEditor'
 
@@ -258,6 +259,7 @@ const replaceMediaElement = async (element, fileDoc) => {
 		: fileDoc.file_url.replace('/private', '')
 	element.src = src
 	element.attachmentName = fileDoc.name
+	delete element.variants
 	if (element.type == 'video') {
 		const posterURL = await getVideoPoster(fileDoc.file_url)
 		element.poster = isPublicPresentation.value ? posterURL : posterURL.replace('/private', '')
@@ -374,11 +376,25 @@ const getCopiedJSON = () => {
 	return JSON.stringify(elementsCopy)
 }
 
+// a slide focused in the navigator is copied as a whole when no element is selected
+const getCopiedSlidesJSON = () => {
+	const slide = slides.value[focusedSlide.value]
+	return JSON.stringify([
+		{
+			background: slide.background,
+			transition: slide.transition,
+			transitionDuration: slide.transitionDuration,
+			elements: slide.elements,
+		},
+	])
+}
+
 const copiedFrom = ref({})
 
 const handleCopy = (e) => {
 	e.preventDefault()
-	const clipboardJSON = getCopiedJSON()
+	const copySlide = !activeElementIds.value.length && slides.value[focusedSlide.value]
+	const clipboardJSON = copySlide ? getCopiedSlidesJSON() : getCopiedJSON()
 	e.clipboardData.setData('application/json', clipboardJSON)
 	copiedFrom.value = {
 		srcPresentation: presentationId.value,
@@ -391,6 +407,40 @@ const handlePastedText = async (clipboardText) => {
 	addTextElement(clipboardText)
 }
 
+// add file attachments of elements copied from a different presentation to the current presentation
+// and update their docnames, in a single call for a list of elements or slides with their elements
+const getUpdatedClipboard = async (json) => {
+	return await call('slides.slides.doctype.presentation.presentation.get_updated_json', {
+		presentation: presentationId.value,
+		json: json,
+	})
+}
+
+const isSlideClipboard = (items) => {
+	return items.length && items.every((item) => Array.isArray(item.elements))
+}
+
+// insert pasted slides after the current slide with new element IDs
+const pasteSlides = (pastedSlides) => {
+	const index = slideIndex.value + 1
+
+	const newSlides = pastedSlides.map((slide) => ({
+		name: '',
+		parent: presentationId.value,
+		background: slide.background,
+		transition: slide.transition,
+		transitionDuration: slide.transitionDuration,
+		elements: slide.elements.map((element) => ({ ...element, id: generateUniqueId() })),
+	}))
+
+	slides.value.splice(index, 0, ...newSlides)
+	slides.value.forEach((slide, i) => {
+		slide.idx = i + 1
+	})
+
+	focusedSlide.value = index
+}
+
 const handlePastedJSON = async (json) => {
 	const pastedArray = Array.isArray(json) ? json : []
 
@@ -406,12 +456,12 @@ const handlePastedJSON = async (json) => {
 	const { srcPresentation, srcSlide } = copiedFrom.value
 
 	if (srcPresentation !== presentationId.value) {
-		// if pasted elements are from a different presentation
-		// add file attachments correctly to current presentation + update docnames in json
-		json = await call('slides.slides.doctype.presentation.presentation.get_updated_json', {
-			presentation: presentationId.value,
-			json: json,
-		})
+		json = await getUpdatedClipboard(json)
+	}
+
+	if (isSlideClipboard(pastedArray)) {
+		pasteSlides(json)
+		return
 	}
 
 	if (srcSlide == slideIndex.value) {
@@ -561,6 +611,7 @@ export {
 	addTextElement,
 	addMediaElement,
 	duplicateElements,
+	getUpdatedClipboard,
 	deleteElements,
 	selectAllElements,
 	getElementPosition,
@@ -1,4 +1,4 @@
-import { computed, ref } from 'vue'
+import { computed, ref, watch } from 'vue'
 import { watchIgnorable, useManualRefHistory } from '@vueuse/core'
 import { createResource, call, createDocumentResource } from 'frappe-ui'
 import { isEqual } from 'lodash'
@@ -31,16 +31,32 @@ const createPresentationResource = createResource({
 	},
 })
 
+// saves are run one after another since each one needs the modified timestamp returned by the previous
+let saveQueue = Promise.resolve()
+
+const enqueueSave = (save) => {
+	const result = saveQueue.then(save)
+	saveQueue = result.catch(() => {})
+	return result
+}
+
 const updatePresentationTitle = async (id, newTitle) => {
-	return call('slides.slides.doctype.presentation.presentation.update_title', {
-		name: id,
-		title: newTitle,
-	}).then((response) => {
-		if (response) {
-			return response
-		} else {
-			throw new Error('Failed to rename presentation')
+	return enqueueSave(async () => {
+		const response = await call('slides.slides.doctype.presentation.presentation.update_title', {
+			name: id,
+			title: newTitle,
+		})
+		if (!response) throw new Error('Failed to rename presentation')
+
+		if (presentationDoc.value && presentationId.value == id) {
+			presentationDoc.value = {
+				...presentationDoc.value,
+				title: newTitle,
+				slug: response.slug,
+				modified: response.modified,
+			}
 		}
+		return response.slug
 	})
 }
 
@@ -81,52 +97,111 @@ const getPresentationResource = (name) => {
 	})
 }
 
-const getPublicPresentationResource = (name) => {
+// number of slides fetched at a time for viewing public and composite presentations
+const SLIDE_WINDOW = 10
+
+const slideWindowRequests = new Map()
+
+const fetchSlideWindow = (name, start) => {
+	// fetched with GET so that windows of public presentations are cached like the bootstrap
 	return createResource({
-		url: 'slides.slides.doctype.presentation.presentation.get_public_presentation',
+		url: 'slides.slides.doctype.presentation.presentation.get_slide_window',
 		method: 'GET',
-		auto: false,
-		makeParams: () => {
-			return { name: name }
-		},
-		transform(doc) {
-			for (const slide of doc.slides || []) {
-				slide.elements = parseElements(slide.elements)
-				slide.transitionDuration = slide.transition_duration
-				// remove the transition_duration field to avoid confusion
-				delete slide.transition_duration
-			}
-		},
-		onSuccess(doc) {
-			slides.value = JSON.parse(JSON.stringify(doc.slides || []))
-			isPublicPresentation.value = Boolean(doc.is_public)
-		},
-	})
+	}).submit({ name: name, start: start })
 }
 
-const getCompositePresentationResource = (name) => {
-	return createResource({
-		url: 'slides.slides.doctype.presentation.presentation.get_composite_presentation',
-		method: 'GET',
-		auto: false,
-		makeParams: () => {
-			return { name: name }
-		},
-		transform(doc) {
-			for (const slide of doc.slides || []) {
-				slide.elements = parseElements(slide.elements)
-				slide.transitionDuration = slide.transition_duration
-				// remove the transition_duration field to avoid confusion
-				delete slide.transition_duration
-			}
-		},
-		onSuccess(doc) {
-			slides.value = JSON.parse(JSON.stringify(doc.slides || []))
-			isPublicPresentation.value = true
-		},
+// the bootstrap of the last presentation requested by the router, reused to render its first window
+let bootstrapRequest = null
+
+const getPresentationBootstrap = (name) => {
+	if (bootstrapRequest?.name != name) {
+		const request = createResource({
+			url: 'slides.slides.doctype.presentation.presentation.get_presentation_bootstrap',
+			method: 'GET',
+		}).submit({ name: name })
+		bootstrapRequest = { name: name, request: request }
+	}
+	return bootstrapRequest.request
+}
+
+const takePresentationBootstrap = (name) => {
+	const request = getPresentationBootstrap(name)
+	bootstrapRequest = null
+	return request
+}
+
+const getPlaceholderSlide = (idx) => ({
+	name: '',
+	idx: idx,
+	background: '',
+	elements: [],
+	thumbnail: '',
+	transition: 'None',
+	transitionDuration: 0,
+	loaded: false,
+})
+
+const applySlideWindow = (response) => {
+	response.slides.forEach((slide, i) => {
+		slide.elements = parseElements(slide.elements)
+		slide.transitionDuration = slide.transition_duration
+		// remove the transition_duration field to avoid confusion
+		delete slide.transition_duration
+		slide.loaded = true
+
+		slides.value[response.start + i] = slide
 	})
 }
 
+const loadSlideWindow = (index) => {
+	const start = Math.floor(index / SLIDE_WINDOW) * SLIDE_WINDOW
+	if (start < 0 || start >= slides.value.length) return
+	if (slides.value[start]?.loaded || slideWindowRequests.has(start)) {
+		return slideWindowRequests.get(start)
+	}
+
+	const name = presentationId.value
+	const request = fetchSlideWindow(name, start)
+		.then((response) => {
+			// ignore responses for a presentation that is no longer being viewed
+			if (presentationId.value == name) applySlideWindow(response)
+		})
+		.catch(() => slideWindowRequests.delete(start))
+
+	slideWindowRequests.set(start, request)
+	return request
+}
+
+const prefetchSlides = (index) => {
+	loadSlideWindow(index)
+	loadSlideWindow(index + SLIDE_WINDOW)
+}
+
+const initWindowedPresentation = async (id) => {
+	slideWindowRequests.clear()
+
+	const response = await takePresentationBootstrap(id)
+	const presentation = response.presentation
+
+	slides.value = Array.from({ length: response.total }, (_, i) => getPlaceholderSlide(i + 1))
+	applySlideWindow(response)
+	slideWindowRequests.set(0, Promise.resolve())
+
+	isPublicPresentation.value = Boolean(presentation.is_public || presentation.is_composite)
+
+	// other windows are loaded as the viewer moves through the slides
+	prefetchSlides(slideIndex.value || 0)
+
+	return { ...presentation, slides: slides.value }
+}
+
+watch(
+	() => slideIndex.value,
+	(index) => {
+		if (readonlyMode.value && slides.value.length) prefetchSlides(index)
+	},
+)
+
 const hasSlideChanged = (originalState, slideState) => {
 	const keysToCompare = ['background', 'transition', 'transitionDuration']
 
@@ -156,18 +231,153 @@ const hasStateChanged = (original, current) => {
 	return hasChanged
 }
 
-const savePresentationDoc = async () => {
-	const newSlides = slides.value.map((slide) => ({
-		...slide,
-		elements: JSON.stringify(slide.elements, null, 2),
+const isBase64Thumbnail = (thumbnail) => thumbnail?.startsWith('data:image')
+
+const getSlidePayload = (slide, idx) => {
+	const payload = {
+		name: slide.name || null,
+		idx: idx,
+		background: slide.background,
+		elements: JSON.stringify(slide.elements),
+		transition: slide.transition,
 		transition_duration: slide.transitionDuration,
-	}))
+	}
+	// rendered thumbnails are uploaded separately in a batch
+	if (!isBase64Thumbnail(slide.thumbnail)) payload.thumbnail = slide.thumbnail
+
+	return payload
+}
+
+const getSlideChanges = (original, current) => {
+	const originalSlides = Object.fromEntries(original.map((slide) => [slide.name, slide]))
+	const currentNames = new Set(current.map((slide) => slide.name).filter(Boolean))
+
+	const changed = []
+	const order = []
+	const thumbnails = []
+
+	current.forEach((slide, index) => {
+		const idx = index + 1
+		const originalSlide = originalSlides[slide.name]
+		const thumbnailChanged = originalSlide?.thumbnail != slide.thumbnail
+
+		if (thumbnailChanged && isBase64Thumbnail(slide.thumbnail)) {
+			thumbnails.push(index)
+		}
+
+		if (
+			!originalSlide ||
+			hasSlideChanged(originalSlide, slide) ||
+			(thumbnailChanged && !isBase64Thumbnail(slide.thumbnail))
+		) {
+			changed.push(getSlidePayload(slide, idx))
+		} else if (originalSlide.idx != idx) {
+			order.push({ name: slide.name, idx: idx })
+		}
+	})
+
+	const deleted = original
+		.filter((slide) => !currentNames.has(slide.name))
+		.map((slide) => slide.name)
+
+	return { changed, order, deleted, thumbnails }
+}
+
+const saveThumbnails = async (liveSlides, savedSlides, indexes, thumbnails) => {
+	const savedThumbnails = await call('slides.api.thumbnail.save_thumbnails', {
+		name: presentationId.value,
+		thumbnails: indexes.map((index, i) => ({
+			slide: savedSlides[index].name,
+			thumbnail: thumbnails[i],
+		})),
+	})
+
+	indexes.forEach((index, i) => {
+		const savedSlide = savedSlides[index]
+		const thumbnailUrl = savedThumbnails[savedSlide.name]
+		if (!thumbnailUrl) return
+
+		ignoreUpdates(() => {
+			const liveSlide = liveSlides[index]
+			if (liveSlide.thumbnail == thumbnails[i]) liveSlide.thumbnail = thumbnailUrl
+		})
+		savedSlide.thumbnail = thumbnailUrl
+	})
+}
+
+const saveChangedSlides = async () => {
+	// keep references to the live slides so that names and thumbnail urls returned by the server can be synced
+	const liveSlides = [...slides.value]
+	const current = JSON.parse(JSON.stringify(liveSlides))
+	const original = presentationDoc.value.slides || []
+
+	const { changed, order, deleted, thumbnails } = getSlideChanges(original, current)
+
+	const response = await call('slides.slides.doctype.presentation.presentation.save_slides', {
+		name: presentationId.value,
+		modified: presentationDoc.value.modified,
+		slides: changed,
+		deleted: deleted,
+		order: order,
+	})
+
+	for (const savedSlide of response.slides) {
+		const index = savedSlide.idx - 1
+		const sentSlide = current[index]
+
+		ignoreUpdates(() => {
+			const liveSlide = liveSlides[index]
+			if (!liveSlide.name) liveSlide.name = savedSlide.name
+		})
+
+		sentSlide.name = savedSlide.name
+		if ('thumbnail' in savedSlide && !isBase64Thumbnail(sentSlide.thumbnail)) {
+			sentSlide.thumbnail = savedSlide.thumbnail
+		}
+	}
+
+	// thumbnails are uploaded once the slides are saved since new slides need a name,
+	// until then they are left empty in the saved state so that failed uploads are retried
+	const pendingThumbnails = thumbnails.map((index) => current[index].thumbnail)
+	thumbnails.forEach((index) => (current[index].thumbnail = ''))
 
-	await presentationResource.value.setValue.submit({
-		slides: newSlides,
+	current.forEach((slide, index) => {
+		slide.idx = index + 1
 	})
 
-	presentationDoc.value = presentationResource.value.doc
+	presentationDoc.value = {
+		...presentationDoc.value,
+		modified: response.modified,
+		slides: current,
+	}
+
+	if (thumbnails.length) {
+		await saveThumbnails(liveSlides, current, thumbnails, pendingThumbnails)
+	}
+}
+
+const savePresentationDoc = () => enqueueSave(saveChangedSlides)
+
+const syncSharingChanges = ({ slides: updatedSlides, modified }) => {
+	// file urls renamed while changing the access level are applied to the live and saved slides
+	const savedSlides = presentationDoc.value?.slides || []
+	for (const updatedSlide of updatedSlides || []) {
+		const targets = [
+			slides.value.find((slide) => slide.name == updatedSlide.name),
+			savedSlides.find((slide) => slide.name == updatedSlide.name),
+		]
+		ignoreUpdates(() => {
+			for (const slide of targets) {
+				if (!slide) continue
+				if (updatedSlide.elements) slide.elements = parseElements(updatedSlide.elements)
+				if (updatedSlide.thumbnail) slide.thumbnail = updatedSlide.thumbnail
+			}
+		})
+	}
+
+	if (presentationDoc.value && modified) {
+		presentationDoc.value = { ...presentationDoc.value, modified: modified }
+	}
 }
 
 const layoutResource = createResource({
@@ -194,13 +404,8 @@ const presentationResource = ref(null)
 const initPresentationDoc = async (id, readonly = false) => {
 	presentationId.value = id
 	if (readonly) {
-		presentationResource.value = getPublicPresentationResource(id)
-		await presentationResource.value.fetch()
-		if (presentationResource.value.data.is_composite) {
-			presentationResource.value = getCompositePresentationResource(id)
-			await presentationResource.value.fetch()
-		}
-		return presentationResource.value.data
+		// slides are loaded in windows so that the first slide can be shown without waiting for the rest
+		return await initWindowedPresentation(id)
 	} else {
 		presentationResource.value = getPresentationResource(id)
 		await presentationResource.value.get.fetch()
@@ -257,6 +462,8 @@ const unsyncedPresentationRecord = ref({})
 
 const isPublicPresentation = ref(false)
 
+const isUpdatingAccess = ref(false)
+
 const readonlyMode = ref(false)
 
 export {
@@ -268,6 +475,8 @@ export {
 	getPresentationResource,
 	hasStateChanged,
 	savePresentationDoc,
+	syncSharingChanges,
+	getPresentationBootstrap,
 	initPresentationDoc,
 	layoutResource,
 	presentationDoc,
@@ -277,6 +486,7 @@ export {
 	ignoreUpdates,
 	unsyncedPresentationRecord,
 	isPublicPresentation,
+	isUpdatingAccess,
 	readonlyMode,
 	parseElements,
 }
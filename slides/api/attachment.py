@@ -0,0 +1,110 @@
+import os
+
+import frappe
+from frappe.utils import now
+
+ORPHAN_BATCH_SIZE = 500
+
+
+def bulk_attach_file_references(presentation: str, files: list[dict]) -> dict[str, str]:
+	"""
+	Attaches existing files to a presentation with a single insert without copying their content.
+	Returns a map of source File name to the name of its new attachment.
+	"""
+	if not files:
+		return {}
+
+	user = frappe.session.user
+	timestamp = now()
+	attachments = {file.name: frappe.generate_hash(length=10) for file in files}
+
+	frappe.db.bulk_insert(
+		"File",
+		fields=[
+			"name",
+			"owner",
+			"creation",
+			"modified",
+			"modified_by",
+			"file_name",
+			"file_url",
+			"is_private",
+			"content_hash",
+			"file_size",
+			"folder",
+			"attached_to_doctype",
+			"attached_to_name",
+		],
+		values=[
+			(
+				attachments[file.name],
+				user,
+				timestamp,
+				timestamp,
+				user,
+				file.file_name,
+				file.file_url,
+				file.is_private,
+				file.content_hash,
+				file.file_size,
+				"Home/Attachments",
+				"Presentation",
+				presentation,
+			)
+			for file in files
+		],
+	)
+
+	return attachments
+
+
+def delete_unreferenced_files(file_urls: list[str]):
+	"""
+	Deletes files on disk which no File doc refers to anymore.
+	"""
+	file_urls = set(filter(None, file_urls))
+	if not file_urls:
+		return
+
+	referenced = set(frappe.get_all("File", filters={"file_url": ["in", list(file_urls)]}, pluck="file_url"))
+
+	for file_url in file_urls - referenced:
+		path = file_url
+		if path.startswith("/files"):
+			path = "/public" + path
+
+		file_path = frappe.get_site_path() + path
+		if os.path.exists(file_path):
+			os.remove(file_path)
+
+
+def delete_orphan_attachments():
+	"""
+	Deletes File docs attached to presentations that no longer exist.
+	Content on disk is shared by all File docs with the same content hash
+	and is removed by frappe along with the last one referring to it.
+	"""
+	File = frappe.qb.DocType("File")
+	Presentation = frappe.qb.DocType("Presentation")
+
+	while True:
+		orphans = (
+			frappe.qb.from_(File)
+			.left_join(Presentation)
+			.on(File.attached_to_name == Presentation.name)
+			.select(File.name)
+			.where(File.attached_to_doctype == "Presentation")
+			.where(Presentation.name.isnull())
+			.limit(ORPHAN_BATCH_SIZE)
+			.run(pluck=True)
+		)
+		if not orphans:
+			break
+
+		for name in orphans:
+			frappe.delete_doc("File", name, ignore_permissions=True)
+
+		frappe.db.commit()
+
+		if len(orphans) < ORPHAN_BATCH_SIZE:
+			break
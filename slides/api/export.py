@@ -0,0 +1,252 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import frappe
+from frappe.utils import cint
+
+from slides.api.thumbnail import get_element_image_path, load_image, render_slide
+from slides.slides.doctype.presentation.presentation import (
+	get_cached_composite_presentation,
+	get_composite_signature,
+	get_presentation_meta,
+	slug,
+)
+from slides.utils import load_elements
+
+EXPORT_EXTENSIONS = {"pdf": "pdf", "png": "zip"}
+EXPORT_EVENT = "slides:export"
+
+# resolution of exported PDF pages, slides are rendered at 960x540 pixels
+PDF_RESOLUTION = 96
+
+# decoded images kept while rendering, a slide's own images are always kept
+IMAGE_CACHE_SIZE = 16
+
+
+def get_export_version(name: str, is_composite: bool, modified) -> str:
+	"""
+	Returns a version of the presentation which changes whenever its content does.
+	Composites also change when any of their references is modified.
+	"""
+	signature = get_composite_signature(name)[0] if is_composite else str(modified)
+	return hashlib.md5(f"{name}:{signature}".encode(), usedforsecurity=False).hexdigest()[:10]
+
+
+def get_export_file_name(meta: frappe._dict, export_format: str) -> str:
+	version = get_export_version(meta.name, meta.is_composite, meta.modified)
+	return f"{slug(meta.title or meta.name)}-{version}.{EXPORT_EXTENSIONS[export_format]}"
+
+
+def get_cached_export(name: str, file_name: str) -> str | None:
+	return frappe.db.get_value(
+		"File",
+		{"attached_to_doctype": "Presentation", "attached_to_name": name, "file_name": file_name},
+		"file_url",
+	)
+
+
+def get_export_slides(meta: frappe._dict) -> tuple[list[frappe._dict], bool]:
+	"""
+	Returns the slides to export and whether their media is public.
+	"""
+	if meta.is_composite:
+		# composites only include public presentations
+		slides = get_cached_composite_presentation(meta.name)["slides"]
+		return [frappe._dict(slide) for slide in slides], True
+
+	slides = frappe.get_all(
+		"Slide",
+		filters={"parent": meta.name, "parenttype": "Presentation"},
+		fields=["background", "elements"],
+		order_by="idx",
+	)
+	return slides, bool(meta.is_public)
+
+
+def get_max_workers() -> int:
+	return max(1, cint(frappe.conf.get("slides_export_workers")) or os.cpu_count() or 1)
+
+
+def get_slide_image_paths(slide: frappe._dict, is_public: bool) -> list[str]:
+	file_paths = []
+	for element in load_elements(slide.elements):
+		if element.get("type") in ("image", "video"):
+			file_path = get_element_image_path(element, is_public)
+			if file_path and file_path not in file_paths:
+				file_paths.append(file_path)
+	return file_paths
+
+
+class ImageCache:
+	"""
+	Keeps the most recently used decoded images, so that media reused across nearby slides
+	is decoded once while memory stays bounded regardless of the size of the deck.
+	"""
+
+	def __init__(self, executor: ThreadPoolExecutor, size: int = IMAGE_CACHE_SIZE):
+		self.executor = executor
+		self.size = size
+		self.images = OrderedDict()
+
+	def load(self, file_paths: list[str]):
+		"""
+		Decodes the images of a slide that are not cached yet in the thread pool.
+		"""
+		missing = [file_path for file_path in file_paths if file_path not in self.images]
+		for file_path, image in zip(missing, self.executor.map(load_image, missing), strict=True):
+			self.images[file_path] = image
+
+		for file_path in file_paths:
+			self.images.move_to_end(file_path)
+
+		# images of the current slide are kept even if there are more of them than the cache size
+		while len(self.images) > max(self.size, len(file_paths)):
+			self.images.popitem(last=False)
+
+	def get(self, file_path: str):
+		return self.images.get(file_path)
+
+
+def publish_progress(name: str, export_format: str, progress: int, total: int):
+	frappe.publish_realtime(
+		EXPORT_EVENT,
+		{"presentation": name, "format": export_format, "progress": progress, "total": total},
+		user=frappe.session.user,
+	)
+
+
+def write_page(output, archive: zipfile.ZipFile | None, index: int, page):
+	if archive:
+		# PNGs are already compressed
+		buffer = BytesIO()
+		page.save(buffer, "PNG", optimize=True)
+		archive.writestr(f"slide-{index + 1:03d}.png", buffer.getvalue())
+	else:
+		page.save(output, "PDF", append=index > 0, resolution=PDF_RESOLUTION)
+
+
+def write_export(output, slides: list[frappe._dict], is_public: bool, export_format: str, on_progress):
+	"""
+	Renders slides one at a time and writes them to the output, so that only one page is held in memory.
+	Media is decoded as the slides using it are rendered.
+	"""
+	archive = zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) if export_format == "png" else None
+
+	with ThreadPoolExecutor(max_workers=get_max_workers()) as executor:
+		images = ImageCache(executor)
+		for index, slide in enumerate(slides):
+			images.load(get_slide_image_paths(slide, is_public))
+			write_page(output, archive, index, render_slide(slide, is_public, images.get))
+			on_progress(index + 1, len(slides))
+
+	if archive:
+		archive.close()
+
+
+def delete_old_exports(name: str, export_format: str, file_name: str):
+	for old_file in frappe.get_all(
+		"File",
+		filters=[
+			["attached_to_doctype", "=", "Presentation"],
+			["attached_to_name", "=", name],
+			["attached_to_field", "=", "export"],
+			["file_name", "like", f"%.{EXPORT_EXTENSIONS[export_format]}"],
+			["file_name", "!=", file_name],
+		],
+		pluck="name",
+	):
+		frappe.delete_doc("File", old_file, ignore_permissions=True)
+
+
+def export_presentation_job(name: str, export_format: str):
+	"""
+	Renders the presentation to a PDF or a zip of PNGs and attaches it to the presentation.
+	Progress is published over realtime as `slides:export`.
+	"""
+	meta = get_presentation_meta(name)
+	if not meta:
+		# deleted after the export was enqueued
+		frappe.publish_realtime(
+			EXPORT_EVENT,
+			{"presentation": name, "format": export_format, "done": True, "failed": True},
+			user=frappe.session.user,
+		)
+		return
+
+	file_name = get_export_file_name(meta, export_format)
+
+	file_url = get_cached_export(name, file_name)
+	if not file_url:
+		slides, is_public = get_export_slides(meta)
+
+		files_path = frappe.get_site_path("private", "files")
+		with tempfile.NamedTemporaryFile("w+b", dir=files_path, suffix=".tmp", delete=False) as output:
+			try:
+				write_export(
+					output,
+					slides,
+					is_public,
+					export_format,
+					lambda progress, total: publish_progress(name, export_format, progress, total),
+				)
+			except Exception:
+				os.remove(output.name)
+				raise
+
+		# the export only becomes visible once it is complete
+		os.replace(output.name, os.path.join(files_path, file_name))
+
+		file_doc = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": file_name,
+				"file_url": f"/private/files/{file_name}",
+				"is_private": 1,
+				"attached_to_doctype": "Presentation",
+				"attached_to_name": name,
+				"attached_to_field": "export",
+			}
+		).insert(ignore_permissions=True)
+		file_url = file_doc.file_url
+
+		delete_old_exports(name, export_format, file_name)
+
+	frappe.publish_realtime(
+		EXPORT_EVENT,
+		{"presentation": name, "format": export_format, "done": True, "file_url": file_url},
+		user=frappe.session.user,
+	)
+
+
+@frappe.whitelist()
+def export_presentation(name, export_format="pdf"):
+	"""
+	Returns the URL of the export if the presentation has not changed since it was last exported,
+	otherwise enqueues the export and returns None.
+	- export_format: "pdf" or "png" for a zip of PNG images of the slides
+	"""
+	frappe.has_permission("Presentation", "read", name, throw=True)
+	if export_format not in EXPORT_EXTENSIONS:
+		frappe.throw(f"Unsupported export format: {export_format}")
+
+	meta = get_presentation_meta(name)
+	if not meta.is_composite and not meta.slide_count:
+		frappe.throw("Presentation has no slides to export")
+
+	file_url = get_cached_export(name, get_export_file_name(meta, export_format))
+	if file_url:
+		return file_url
+
+	frappe.enqueue(
+		"slides.api.export.export_presentation_job",
+		queue="long",
+		job_id=f"slides:export:{name}:{export_format}",
+		deduplicate=True,
+		name=name,
+		export_format=export_format,
+	)
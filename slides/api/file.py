@@ -1,10 +1,35 @@
+import hashlib
 import mimetypes
 import os
+import re
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.parse import quote
 
 import frappe
 from frappe import _
+from frappe.utils import cint
 from werkzeug.exceptions import Forbidden, NotFound
+from werkzeug.http import is_resource_modified, parse_if_range_header
 from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+CHUNK_SIZE = 64 * 1024
+
+# maximum bytes served per range unless overridden by `slides_max_range_size` in site config
+DEFAULT_MAX_RANGE_SIZE = 16 * 1024 * 1024
+
+MAX_RANGES = 16
+
+OFFLOAD_MODES = ("nginx", "sendfile")
+
+MEDIA_METADATA_CACHE_KEY = "slides:media_metadata"
+MEDIA_PERMISSION_CACHE_KEY = "slides:media_permission"
+MEDIA_PERMISSION_CACHE_TTL = 60
+
+# browser cache lifetime for public media unless overridden by `slides_media_max_age` in site config
+DEFAULT_MEDIA_MAX_AGE = 24 * 60 * 60
 
 
 def get_file_size(file_path: str) -> int:
@@ -14,84 +39,345 @@ def get_file_size(file_path: str) -> int:
 	return os.path.getsize(file_path)
 
 
-def get_range(range_header: str, file_size: int) -> tuple[int, int]:
+def get_max_range_size() -> int:
 	"""
-	Extracts the byte range from Range header.
+	Returns the maximum number of bytes served for a single range, configurable via site config.
 	"""
-	import re
+	return cint(frappe.conf.get("slides_max_range_size")) or DEFAULT_MAX_RANGE_SIZE
+
+
+def get_ranges(range_header: str, file_size: int) -> list[tuple[int, int]] | None:
+	"""
+	Extracts the byte ranges from Range header as a list of inclusive (start, end) tuples.
+	Supports multiple ranges and suffix ranges (bytes=-500).
+	Returns None if the header is invalid and should be ignored,
+	and an empty list if none of the ranges can be satisfied.
+	"""
+	match = re.fullmatch(r"\s*bytes\s*=\s*(.+)", range_header)
+	if not match:
+		return None
+
+	max_range_size = get_max_range_size()
+	ranges = []
+
+	for spec in match.group(1).split(","):
+		spec = spec.strip()
+		if not spec:
+			continue
 
-	range_start, range_end = 0, None
-	match = re.search(r"bytes=(\d+)-(\d*)", range_header)
+		range_match = re.fullmatch(r"(\d*)\s*-\s*(\d*)", spec)
+		if not range_match or not any(range_match.groups()):
+			return None
 
-	if match:
-		range_start = int(match.group(1))
-		if match.group(2):
-			range_end = int(match.group(2))
+		first, last = range_match.groups()
 
-	range_end = range_end or file_size - 1
+		if not first:
+			# suffix range - last n bytes of the file
+			suffix_length = int(last)
+			# an empty file has no last bytes to serve
+			if not suffix_length or not file_size:
+				continue
+			range_start, range_end = max(file_size - suffix_length, 0), file_size - 1
+		else:
+			range_start = int(first)
+			range_end = int(last) if last else file_size - 1
+			if last and range_end < range_start:
+				return None
+			if range_start >= file_size:
+				continue
+			range_end = min(range_end, file_size - 1)
+
+		# clients can request the rest of the range in subsequent requests
+		range_end = min(range_end, range_start + max_range_size - 1)
+		ranges.append((range_start, range_end))
+
+		if len(ranges) == MAX_RANGES:
+			break
 
-	return range_start, range_end
+	return ranges
 
 
-def get_file_data(file_path: str, range_start: int = 0, range_end: int = 0) -> bytes:
+def iter_file_range(file, range_start: int, range_end: int):
 	"""
-	Returns specified range of bytes from the file.
-	If range_end is None, returns the full file content.
+	Yields the specified range of bytes from an open file in chunks.
 	"""
+	file.seek(range_start)
+	remaining = range_end - range_start + 1
+
+	while remaining > 0:
+		chunk = file.read(min(CHUNK_SIZE, remaining))
+		if not chunk:
+			break
+		remaining -= len(chunk)
+		yield chunk
+
+
+def iter_file_ranges(file_path: str, ranges: list[tuple[int, int]]):
 	with open(file_path, "rb") as f:
-		f.seek(range_start)
+		for range_start, range_end in ranges:
+			yield from iter_file_range(f, range_start, range_end)
+
+
+def get_multipart_headers(
+	ranges: list[tuple[int, int]], boundary: str, mimetype: str, file_size: int
+) -> tuple[list[bytes], bytes]:
+	"""
+	Returns the part headers for each range and the closing delimiter of a multipart/byteranges body.
+	"""
+	part_headers = [
+		(
+			f"\r\n--{boundary}\r\n"
+			f"Content-Type: {mimetype}\r\n"
+			f"Content-Range: bytes {range_start}-{range_end}/{file_size}\r\n\r\n"
+		).encode()
+		for range_start, range_end in ranges
+	]
+	closing = f"\r\n--{boundary}--\r\n".encode()
+
+	return part_headers, closing
 
-		if range_end == 0:
-			# return the full file content in the response
-			data = f.read()
-		else:
-			# read the specified range from the file
-			data = f.read(range_end - range_start + 1)
 
-	return data
+def iter_multipart_ranges(
+	file_path: str, ranges: list[tuple[int, int]], part_headers: list[bytes], closing: bytes
+):
+	with open(file_path, "rb") as f:
+		for (range_start, range_end), part_header in zip(ranges, part_headers, strict=True):
+			yield part_header
+			yield from iter_file_range(f, range_start, range_end)
+		yield closing
 
 
-def get_file_metadata(src: str) -> tuple[str, int, str]:
+def get_relative_file_path(src: str) -> str:
 	"""
-	Returns file metadata including path, size, and MIME type.
+	Returns the path of the file relative to the site directory.
 	"""
 	if src.startswith("/files"):
 		src = "/public" + src
-	file_path = frappe.get_site_path() + src
+	return src
+
+
+def get_file_metadata(src: str) -> tuple[str, int, str, float]:
+	"""
+	Returns file metadata including path, size, MIME type and last modified time.
+	"""
+	file_path = frappe.get_site_path() + get_relative_file_path(src)
 	file_size = get_file_size(file_path)
 	mimetype = mimetypes.guess_type(file_path)[0] or "video/mp4"
+	last_modified = os.path.getmtime(file_path)
+
+	return file_path, file_size, mimetype, last_modified
+
+
+def get_cached_file_metadata(src: str) -> frappe._dict:
+	"""
+	Returns the privacy and file metadata for a file URL.
+	Cached until a File doc with the URL is updated or deleted.
+	"""
+	metadata = frappe.cache.hget(MEDIA_METADATA_CACHE_KEY, src)
+	if metadata:
+		return frappe._dict(metadata)
+
+	is_private = frappe.db.get_value("File", {"file_url": src}, "is_private")
+	if is_private is None:
+		raise NotFound
 
-	return file_path, file_size, mimetype
+	file_path, file_size, mimetype, last_modified = get_file_metadata(src)
+	metadata = {
+		"is_private": is_private,
+		"file_path": file_path,
+		"file_size": file_size,
+		"mimetype": mimetype,
+		"last_modified": last_modified,
+	}
+	frappe.cache.hset(MEDIA_METADATA_CACHE_KEY, src, metadata)
 
+	return frappe._dict(metadata)
 
-def get_media_response(src: str) -> Response:
+
+def get_permission_cache_prefix(src: str) -> str:
+	return f"{MEDIA_PERMISSION_CACHE_KEY}:{src}:"
+
+
+def has_file_permission(src: str) -> bool:
+	"""
+	Checks if the session user can read any of the File docs referring to the URL,
+	since attachments shared across presentations point to the same file.
+	The result is cached per user for a short duration to avoid permission checks on every range request.
+	"""
+	user = frappe.session.user
+	cache_key = get_permission_cache_prefix(src) + user
+
+	allowed = frappe.cache.get_value(cache_key)
+	if allowed is not None:
+		return allowed
+
+	allowed = any(
+		frappe.has_permission("File", "read", file_name, user=user)
+		for file_name in frappe.get_all("File", filters={"file_url": src}, pluck="name")
+	)
+	frappe.cache.set_value(cache_key, allowed, expires_in_sec=MEDIA_PERMISSION_CACHE_TTL)
+
+	return allowed
+
+
+def clear_media_cache(doc, method=None):
+	"""
+	Clears cached metadata and permissions of a file when its File doc is updated or deleted.
+	"""
+	file_urls = {doc.file_url}
+	doc_before_save = doc.get_doc_before_save() if method == "on_update" else None
+	if doc_before_save:
+		file_urls.add(doc_before_save.file_url)
+
+	clear_media_cache_for_urls(file_urls)
+
+
+def clear_media_cache_for_urls(file_urls: list[str]):
+	"""
+	Clears cached metadata and permissions of files updated without going through their File docs.
+	"""
+	for file_url in filter(None, set(file_urls)):
+		frappe.cache.hdel(MEDIA_METADATA_CACHE_KEY, file_url)
+		# the prefix is matched as a pattern, so glob characters in the URL are escaped
+		frappe.cache.delete_keys(re.sub(r"([*?\[\]\\])", r"\\\1", get_permission_cache_prefix(file_url)))
+
+
+@lru_cache(maxsize=1024)
+def get_file_etag(file_path: str, file_size: int, last_modified: float) -> str:
+	"""
+	Returns an ETag for the file based on its path, size and last modified time.
+	"""
+	return hashlib.sha1(f"{file_path}:{file_size}:{last_modified}".encode()).hexdigest()[:20]
+
+
+def get_cache_control(is_private: bool) -> str:
+	"""
+	Returns the Cache-Control policy for media based on its privacy.
+	Private media is only cached by the browser and always revalidated.
+	"""
+	if is_private:
+		return "private, max-age=0, must-revalidate"
+
+	max_age = cint(frappe.conf.get("slides_media_max_age")) or DEFAULT_MEDIA_MAX_AGE
+	return f"public, max-age={max_age}"
+
+
+def is_range_request_valid(etag: str, last_modified: datetime) -> bool:
+	"""
+	Checks the If-Range header to determine if the requested range can be served,
+	otherwise the full content should be returned since the client copy is outdated.
+	"""
+	if_range = parse_if_range_header(frappe.request.headers.get("If-Range"))
+
+	if if_range.date:
+		return if_range.date >= last_modified
+
+	return if_range.etag is None or if_range.etag == etag
+
+
+def set_cache_headers(response: Response, etag: str, last_modified: datetime, is_private: bool):
+	response.set_etag(etag)
+	response.last_modified = last_modified
+	response.headers["Cache-Control"] = get_cache_control(is_private)
+
+
+def get_offload_mode() -> str | None:
+	"""
+	Returns the configured mode for handing over media transfer to the reverse proxy, if any.
+	Set `slides_media_offload` in site config to "nginx" (X-Accel-Redirect) or "sendfile" (X-Sendfile).
+	"""
+	mode = frappe.conf.get("slides_media_offload")
+	return mode if mode in OFFLOAD_MODES else None
+
+
+def get_offload_response(src: str, mode: str, is_private: bool) -> Response:
+	"""
+	Returns an empty response instructing the reverse proxy to serve the file.
+	The proxy handles range and conditional requests for the file itself.
+	"""
+	relative_path = get_relative_file_path(src)
+	mimetype = mimetypes.guess_type(relative_path)[0] or "video/mp4"
+
+	response = Response(mimetype=mimetype)
+
+	if mode == "nginx":
+		prefix = frappe.conf.get("slides_media_offload_prefix") or "/protected/"
+		response.headers["X-Accel-Redirect"] = quote(prefix.rstrip("/") + relative_path)
+	else:
+		response.headers["X-Sendfile"] = os.path.abspath(frappe.get_site_path() + relative_path)
+
+	response.headers["Cache-Control"] = get_cache_control(is_private)
+	return response
+
+
+def get_media_response(src: str, is_private: bool = False) -> Response:
 	"""
 	Processes the range header from browser to return valid response.
+	File content is streamed in chunks instead of being read into memory,
+	or handed over to the reverse proxy if media offloading is enabled.
 	"""
-	file_path, file_size, mimetype = get_file_metadata(src)
+	offload_mode = get_offload_mode()
+	if offload_mode:
+		return get_offload_response(src, offload_mode, is_private)
+
+	metadata = get_cached_file_metadata(src)
+	file_path, file_size, mimetype = metadata.file_path, metadata.file_size, metadata.mimetype
+	mtime = metadata.last_modified
+
+	etag = get_file_etag(file_path, file_size, mtime)
+	# HTTP dates have a precision of seconds
+	last_modified = datetime.fromtimestamp(int(mtime), tz=timezone.utc)
+
+	# if the browser already has the latest copy, return a not modified response
+	if not is_resource_modified(frappe.request.environ, etag=etag, last_modified=last_modified):
+		response = Response(status=304)
+		set_cache_headers(response, etag, last_modified, is_private)
+		return response
 
 	range_header = frappe.request.headers.get("Range", None)
+	ranges = None
+	if range_header and is_range_request_valid(etag, last_modified):
+		ranges = get_ranges(range_header, file_size)
+
+	# none of the requested ranges overlap the file
+	if ranges == []:
+		response = Response(status=416)
+		response.headers["Content-Range"] = f"bytes */{file_size}"
+		response.headers["Accept-Ranges"] = "bytes"
+		return response
 
-	# if the request includes a Range header, return a partial content response
-	if range_header:
-		range_start, range_end = get_range(range_header, file_size)
+	# if the request includes a single range, return a partial content response
+	if ranges and len(ranges) == 1:
+		range_start, range_end = ranges[0]
+		response = Response(
+			iter_file_ranges(file_path, ranges), 206, mimetype=mimetype, direct_passthrough=True
+		)
+		response.headers["Content-Length"] = str(range_end - range_start + 1)
+		response.headers["Content-Range"] = f"bytes {range_start}-{range_end}/{file_size}"
 
-		file_data = get_file_data(file_path, range_start, range_end)
-		status_code = 206  # Partial Content
-		content_length = range_end - range_start + 1
+	# for multiple ranges, return each range as a part of a multipart response
+	elif ranges:
+		boundary = uuid.uuid4().hex
+		part_headers, closing = get_multipart_headers(ranges, boundary, mimetype, file_size)
+		content_length = sum(len(header) for header in part_headers) + len(closing)
+		content_length += sum(range_end - range_start + 1 for range_start, range_end in ranges)
+
+		response = Response(
+			iter_multipart_ranges(file_path, ranges, part_headers, closing),
+			206,
+			content_type=f"multipart/byteranges; boundary={boundary}",
+			direct_passthrough=True,
+		)
+		response.headers["Content-Length"] = str(content_length)
 
 	# otherwise, return the full content response
 	else:
-		file_data = get_file_data(file_path)
-		status_code = 200  # Full Content
-		content_length = file_size
+		file = wrap_file(frappe.request.environ, open(file_path, "rb"), buffer_size=CHUNK_SIZE)
+		response = Response(file, 200, mimetype=mimetype, direct_passthrough=True)
+		response.headers["Content-Length"] = str(file_size)
 
-	response = Response(file_data, status_code, mimetype=mimetype, direct_passthrough=True)
-	response.headers["Content-Length"] = str(content_length)
 	response.headers["Accept-Ranges"] = "bytes"
-
-	if range_start is not None and range_end is not None:
-		response.headers["Content-Range"] = f"bytes {range_start}-{range_end}/{file_size}"
+	set_cache_headers(response, etag, last_modified, is_private)
 	return response
 
 
@@ -100,13 +386,10 @@ def get_video_file(src: str) -> Response:
 	"""
 	Fetches permitted video file and returns a response.
 	"""
-	file_doc = frappe.get_doc("File", {"file_url": src})
-
-	if not file_doc:
-		raise NotFound
+	metadata = get_cached_file_metadata(src)
 
 	# check if the user has read permission on the file
-	if file_doc.is_private and not frappe.has_permission("File", "read", file_doc):
+	if metadata.is_private and not has_file_permission(src):
 		raise Forbidden(_("You don't have permission to access this file"))
 
-	return get_media_response(src)
+	return get_media_response(src, metadata.is_private)
@@ -0,0 +1,342 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import frappe
+from frappe.utils import cint, now
+from PIL import Image
+
+from slides.slides.doctype.presentation.presentation import clear_composite_cache, clear_presentation_meta
+from slides.utils import dump_elements, load_elements
+
+try:
+	# registers the AVIF codec on Pillow versions without native support
+	import pillow_avif  # noqa: F401
+except ImportError:
+	pass
+
+CONVERTIBLE_EXTENSIONS = ("png", "jpeg", "jpg")
+
+# widths of the smaller variants generated for each image unless overridden by `slides_image_widths`
+DEFAULT_IMAGE_WIDTHS = (320, 640, 1280)
+
+DEFAULT_WEBP_QUALITY = 80
+DEFAULT_AVIF_QUALITY = 60
+WEBP_METHOD = 6
+
+
+def can_convert_image(extn):
+	return extn.lower() in CONVERTIBLE_EXTENSIONS
+
+
+def is_avif_supported() -> bool:
+	Image.init()
+	return "AVIF" in Image.SAVE
+
+
+def get_encoding_options() -> dict:
+	"""
+	Returns the variant widths and encoder settings for image optimization from site config.
+	"""
+	widths = frappe.conf.get("slides_image_widths") or DEFAULT_IMAGE_WIDTHS
+	return {
+		"widths": sorted(cint(width) for width in widths if cint(width) > 0),
+		"quality": cint(frappe.conf.get("slides_image_quality")) or DEFAULT_WEBP_QUALITY,
+		"avif_quality": cint(frappe.conf.get("slides_avif_quality")) or DEFAULT_AVIF_QUALITY,
+		"avif": is_avif_supported() and not frappe.conf.get("slides_disable_avif"),
+	}
+
+
+def convert_and_save_image(image, path, image_format="WEBP", quality=DEFAULT_WEBP_QUALITY):
+	if image_format == "WEBP":
+		image.save(path, "WEBP", quality=quality, method=WEBP_METHOD)
+	else:
+		image.save(path, image_format, quality=quality)
+	return path
+
+
+def get_variant_path(path: str, width: int, extn: str) -> str:
+	return f"{os.path.splitext(path)[0]}-{width}w.{extn}"
+
+
+def convert_image(
+	source_path: str,
+	target_path: str,
+	widths: list[int] | None = None,
+	quality: int = DEFAULT_WEBP_QUALITY,
+	avif: bool = False,
+	avif_quality: int = DEFAULT_AVIF_QUALITY,
+) -> list[dict]:
+	"""
+	Converts the image at source path to WEBP along with smaller variants for each width
+	and AVIF variants if supported.
+	Returns the path, width and format of each saved variant, the full size WEBP being the first.
+	Runs in a worker process, so it must not depend on frappe.
+	"""
+	with Image.open(source_path) as image:
+		if image.mode not in ("RGB", "RGBA"):
+			has_alpha = "A" in image.getbands() or "transparency" in image.info
+			image = image.convert("RGBA" if has_alpha else "RGB")
+
+		variants = [
+			{
+				"path": convert_and_save_image(image, target_path, quality=quality),
+				"width": image.width,
+				"format": "webp",
+			}
+		]
+
+		formats = [("webp", "WEBP", quality)]
+		if avif:
+			formats.append(("avif", "AVIF", avif_quality))
+
+		for width in [*[width for width in widths or [] if width < image.width], image.width]:
+			resized = image
+			if width != image.width:
+				height = max(1, round(image.height * width / image.width))
+				resized = image.resize((width, height), Image.LANCZOS)
+
+			for extn, image_format, format_quality in formats:
+				if width == image.width and extn == "webp":
+					continue
+				path = get_variant_path(target_path, width, extn)
+				convert_and_save_image(resized, path, image_format, format_quality)
+				variants.append({"path": path, "width": width, "format": extn})
+
+	return variants
+
+
+def get_image_attribute(element: dict) -> str:
+	return "poster" if element.get("type") == "video" else "src"
+
+
+def get_media_elements(slides) -> list[tuple]:
+	"""
+	Returns (slide, elements, element) for every image and video element in the slides.
+	"""
+	media_elements = []
+	for slide in slides:
+		elements = load_elements(slide.elements)
+		for element in elements:
+			if element.get("type") in ["image", "video"]:
+				media_elements.append((slide, elements, element))
+
+	return media_elements
+
+
+def get_file_url(element: dict, is_public: bool) -> str:
+	url = element.get(get_image_attribute(element), "")
+	return url if is_public else f"/private{url}"
+
+
+def get_convertible_files(presentation: str, file_urls: set[str]) -> list[dict]:
+	"""
+	Returns File docs attached to the presentation which can be converted to WEBP.
+	"""
+	file_urls = [url for url in file_urls if can_convert_image(os.path.splitext(url)[1].lstrip("."))]
+	if not file_urls:
+		return []
+
+	return frappe.get_all(
+		"File",
+		filters={"attached_to_name": presentation, "file_url": ["in", file_urls]},
+		fields=["name", "file_url"],
+	)
+
+
+def get_webp_name(name: str) -> str:
+	return f"{os.path.splitext(name)[0]}.webp"
+
+
+def get_file_path(file_url: str) -> str:
+	if file_url.startswith("/files"):
+		file_url = "/public" + file_url
+	return frappe.get_site_path() + file_url
+
+
+def get_max_workers(count: int) -> int:
+	return max(1, min(count, cint(frappe.conf.get("slides_image_workers")) or os.cpu_count() or 1))
+
+
+def convert_files(files: list[dict], on_progress=None) -> dict[str, list[dict]]:
+	"""
+	Converts files to WEBP (and AVIF) variants in a process pool.
+	Returns a map of original file URL to the saved variants for successful conversions.
+	"""
+	converted = {}
+	if not files:
+		return converted
+
+	options = get_encoding_options()
+
+	with ProcessPoolExecutor(max_workers=get_max_workers(len(files))) as executor:
+		futures = {
+			executor.submit(
+				convert_image,
+				get_file_path(file.file_url),
+				get_webp_name(get_file_path(file.file_url)),
+				**options,
+			): file
+			for file in files
+		}
+
+		for count, future in enumerate(as_completed(futures), start=1):
+			file = futures[future]
+			try:
+				converted[file.file_url] = future.result()
+			except Exception as e:
+				frappe.log_error(f"Failed to convert image {file.file_url}: {e}")
+
+			if on_progress:
+				on_progress(count, len(files))
+
+	return converted
+
+
+def create_variant_file_doc(_file, path: str) -> str:
+	new_file = frappe.copy_doc(_file)
+	new_file.file_name = os.path.basename(path)
+	new_file.file_url = f"{os.path.dirname(_file.file_url)}/{new_file.file_name}"
+	new_file.file_size = os.path.getsize(path)
+	new_file.content_hash = None
+	new_file.save()
+	return new_file.file_url
+
+
+def create_variant_file_docs(file_name: str, variants: list[dict]) -> list[dict]:
+	"""
+	Creates File docs for the converted variants of a file.
+	Returns the variants with their file URLs, the full size WEBP being the first.
+	"""
+	_file = frappe.get_doc("File", file_name)
+	return [
+		{
+			"src": create_variant_file_doc(_file, variant["path"]).replace("/private", ""),
+			"width": variant["width"],
+			"format": variant["format"],
+		}
+		for variant in variants
+	]
+
+
+def publish_progress(presentation: str, progress: int, total: int):
+	frappe.publish_realtime(
+		"slides:optimize_images",
+		{"presentation": presentation, "progress": progress, "total": total},
+		user=frappe.session.user,
+	)
+
+
+def get_variant_paths(converted: dict[str, list[dict]]) -> list[str]:
+	return [variant["path"] for variants in converted.values() for variant in variants]
+
+
+def remove_variant_files(paths: list[str]):
+	for path in paths:
+		if os.path.exists(path):
+			os.remove(path)
+
+
+def replace_image_urls(
+	slides: list[dict], is_public: bool, file_variants: dict[str, list[dict]]
+) -> list[dict]:
+	"""
+	Points image and video elements at their optimized variants.
+	Returns the name and new elements of the slides that were updated.
+	"""
+	updated_slides = {}
+	for slide, elements, element in get_media_elements(slides):
+		variants = file_variants.get(get_file_url(element, is_public))
+		if variants:
+			element[get_image_attribute(element)] = variants[0]["src"]
+			# smaller and AVIF variants let the viewer pick the smallest adequate image
+			if element.get("type") == "image":
+				element["variants"] = variants
+			updated_slides[slide.name] = {"name": slide.name, "elements": dump_elements(elements)}
+
+	return list(updated_slides.values())
+
+
+def update_slide_images(
+	name: str, is_public: bool, file_variants: dict[str, list[dict]]
+) -> tuple[list, str | None]:
+	"""
+	Rewrites the slides with the variants, reading them again since they may have been edited
+	while images were being converted. Returns the updated slides and the new modified timestamp.
+	"""
+	# the row is only locked for the final update so that saves are not blocked during conversion
+	current_is_public = frappe.db.get_value("Presentation", name, "is_public", for_update=True)
+	if current_is_public is None or cint(current_is_public) != cint(is_public):
+		frappe.throw("Presentation was deleted or its access level was changed while optimizing images")
+
+	slides = frappe.get_all(
+		"Slide",
+		filters={"parent": name, "parenttype": "Presentation"},
+		fields=["name", "elements"],
+	)
+	updated_slides = replace_image_urls(slides, is_public, file_variants)
+	for slide in updated_slides:
+		frappe.db.set_value("Slide", slide["name"], "elements", slide["elements"], update_modified=False)
+
+	if not updated_slides:
+		return [], None
+
+	# open editors have to pick up the new urls before saving again
+	modified = now()
+	frappe.db.set_value("Presentation", name, "modified", modified, update_modified=False)
+	return updated_slides, modified
+
+
+def optimize_presentation_images(name: str):
+	"""
+	Converts PNG/JPEG images used in a presentation to WEBP, generates responsive variants
+	and updates the slides to use them.
+	Each image is converted once even if it is used on multiple slides.
+	Variants are removed again if the slides cannot be updated.
+	"""
+	is_public = frappe.db.get_value("Presentation", name, "is_public")
+	slides = frappe.get_all(
+		"Slide",
+		filters={"parent": name, "parenttype": "Presentation"},
+		fields=["name", "elements"],
+	)
+
+	file_urls = {
+		get_file_url(element, is_public) for _slide, _elements, element in get_media_elements(slides)
+	}
+	files = get_convertible_files(name, file_urls)
+
+	converted = convert_files(files, lambda progress, total: publish_progress(name, progress, total))
+
+	try:
+		file_variants = {}
+		for file in files:
+			if file.file_url in converted:
+				file_variants[file.file_url] = create_variant_file_docs(file.name, converted[file.file_url])
+
+		updated_slides, modified = update_slide_images(name, is_public, file_variants)
+		frappe.db.commit()
+	except Exception:
+		frappe.db.rollback()
+		remove_variant_files(get_variant_paths(converted))
+		frappe.publish_realtime(
+			"slides:optimize_images",
+			{"presentation": name, "done": True, "failed": True},
+			user=frappe.session.user,
+		)
+		raise
+
+	frappe.clear_document_cache("Presentation", name)
+	clear_presentation_meta(name)
+	clear_composite_cache(name)
+
+	frappe.publish_realtime(
+		"slides:optimize_images",
+		{
+			"presentation": name,
+			"done": True,
+			"updated_slides": len(updated_slides),
+			"modified": modified,
+			"slides": updated_slides,
+		},
+		user=frappe.session.user,
+	)
@@ -0,0 +1,241 @@
+import cProfile
+import io
+import json
+import pstats
+import random
+import time
+
+import frappe
+from frappe.utils import cint, flt, now
+from werkzeug.wrappers import Response
+
+METRICS_CACHE_KEY = "slides:metrics"
+METRICS_METHODS_CACHE_KEY = "slides:metrics_methods"
+PROFILES_CACHE_KEY = "slides:profiles"
+
+# upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+MAX_PROFILES = 50
+PROFILE_LINES = 40
+
+# calls are only profiled if they take longer than this unless overridden by `slides_profile_min_duration`
+DEFAULT_PROFILE_MIN_DURATION = 1.0
+
+
+def is_enabled() -> bool:
+	"""
+	Instrumentation is opt-in with `slides_instrumentation` in site config.
+	"""
+	return bool(cint(frappe.conf.get("slides_instrumentation")))
+
+
+def get_method(path: str) -> str | None:
+	"""
+	Returns the Slides method called by an API request path like /api/method/slides.api.is_slides_user.
+	"""
+	if "/method/" not in path:
+		return None
+
+	method = path.split("/method/", 1)[1].strip("/")
+	return method if method.startswith("slides.") else None
+
+
+def get_metrics_key(method: str) -> str:
+	return f"{METRICS_CACHE_KEY}:{method}"
+
+
+def instrument_queries(state: frappe._dict):
+	sql = frappe.db.sql
+
+	def instrumented_sql(*args, **kwargs):
+		start = time.perf_counter()
+		try:
+			return sql(*args, **kwargs)
+		finally:
+			state.queries += 1
+			state.query_time += time.perf_counter() - start
+
+	frappe.db.sql = instrumented_sql
+
+
+def before_request():
+	if not is_enabled() or not frappe.request:
+		return
+
+	method = get_method(frappe.request.path)
+	if not method:
+		return
+
+	state = frappe._dict(method=method, queries=0, query_time=0.0, profiler=None)
+	instrument_queries(state)
+
+	if random.random() < flt(frappe.conf.get("slides_profile_sample_rate")):
+		state.profiler = cProfile.Profile()
+		state.profiler.enable()
+
+	frappe.local.slides_metrics = state
+	state.start = time.perf_counter()
+
+
+def get_response_bytes(response) -> tuple[int, int]:
+	"""
+	Returns the size of the response and the bytes streamed from files, like media ranges.
+	"""
+	if response is None:
+		return 0, 0
+
+	if response.direct_passthrough or response.is_streamed:
+		# files are streamed without being buffered, the length is known upfront
+		return 0, response.content_length or 0
+
+	return response.content_length or len(response.get_data()), 0
+
+
+def get_bucket(duration: float) -> str:
+	for bucket in LATENCY_BUCKETS:
+		if duration <= bucket:
+			return str(bucket)
+	return "+Inf"
+
+
+def after_request(response=None, request=None):
+	state = frappe.local.__dict__.pop("slides_metrics", None)
+	if not state:
+		return
+
+	duration = time.perf_counter() - state.start
+	frappe.local.db.__dict__.pop("sql", None)
+
+	if state.profiler:
+		state.profiler.disable()
+		min_duration = flt(frappe.conf.get("slides_profile_min_duration")) or DEFAULT_PROFILE_MIN_DURATION
+		if duration >= min_duration:
+			save_profile(state.method, duration, state.profiler)
+
+	response_bytes, streamed_bytes = get_response_bytes(response)
+	status = response.status_code if response is not None else 0
+
+	# the pipeline talks to redis directly, so keys are prefixed with the site here
+	key = frappe.cache.make_key(get_metrics_key(state.method))
+	pipeline = frappe.cache.pipeline()
+	pipeline.sadd(frappe.cache.make_key(METRICS_METHODS_CACHE_KEY), state.method)
+	pipeline.hincrby(key, "count", 1)
+	pipeline.hincrbyfloat(key, "duration", duration)
+	pipeline.hincrby(key, f"bucket:{get_bucket(duration)}", 1)
+	pipeline.hincrby(key, "queries", state.queries)
+	pipeline.hincrbyfloat(key, "query_time", state.query_time)
+	pipeline.hincrby(key, "response_bytes", response_bytes)
+	pipeline.hincrby(key, "streamed_bytes", streamed_bytes)
+	if status >= 400:
+		pipeline.hincrby(key, "errors", 1)
+	pipeline.execute()
+
+
+def save_profile(method: str, duration: float, profiler: cProfile.Profile):
+	output = io.StringIO()
+	pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+
+	key = frappe.cache.make_key(PROFILES_CACHE_KEY)
+	profile = {
+		"method": method,
+		"duration": round(duration, 4),
+		"timestamp": now(),
+		"stats": output.getvalue(),
+	}
+
+	pipeline = frappe.cache.pipeline()
+	pipeline.lpush(key, json.dumps(profile))
+	pipeline.ltrim(key, 0, MAX_PROFILES - 1)
+	pipeline.execute()
+
+
+def get_method_metrics(method: str) -> dict:
+	# counters are plain numbers, read them without the unpickling done by frappe.cache.hgetall
+	fields = frappe.cache.pipeline().hgetall(frappe.cache.make_key(get_metrics_key(method))).execute()[0]
+	values = {field.decode(): float(value) for field, value in fields.items()}
+	count = int(values.get("count", 0))
+
+	histogram, cumulative = {}, 0
+	for bucket in (*map(str, LATENCY_BUCKETS), "+Inf"):
+		cumulative += int(values.get(f"bucket:{bucket}", 0))
+		histogram[bucket] = cumulative
+
+	return {
+		"method": method,
+		"count": count,
+		"errors": int(values.get("errors", 0)),
+		"duration": values.get("duration", 0.0),
+		"avg_duration": values.get("duration", 0.0) / count if count else 0.0,
+		"queries": int(values.get("queries", 0)),
+		"avg_queries": values.get("queries", 0) / count if count else 0.0,
+		"query_time": values.get("query_time", 0.0),
+		"response_bytes": int(values.get("response_bytes", 0)),
+		"streamed_bytes": int(values.get("streamed_bytes", 0)),
+		"histogram": histogram,
+	}
+
+
+def get_instrumented_methods() -> list[str]:
+	return sorted(method.decode() for method in frappe.cache.smembers(METRICS_METHODS_CACHE_KEY))
+
+
+@frappe.whitelist()
+def get_metrics():
+	"""
+	Returns aggregated metrics of Slides endpoints, slowest in total first.
+	"""
+	frappe.only_for("System Manager")
+
+	metrics = [get_method_metrics(method) for method in get_instrumented_methods()]
+	return sorted(metrics, key=lambda metric: metric["duration"], reverse=True)
+
+
+@frappe.whitelist(methods=["GET"])
+def get_prometheus_metrics():
+	"""
+	Returns the metrics of Slides endpoints in the Prometheus text format.
+	"""
+	frappe.only_for("System Manager")
+
+	lines = [
+		"# TYPE slides_request_duration_seconds histogram",
+		"# TYPE slides_requests_errors_total counter",
+		"# TYPE slides_sql_queries_total counter",
+		"# TYPE slides_sql_duration_seconds_total counter",
+		"# TYPE slides_response_bytes_total counter",
+		"# TYPE slides_streamed_bytes_total counter",
+	]
+	for metric in get_metrics():
+		label = f'method="{metric["method"]}"'
+		for bucket, count in metric["histogram"].items():
+			lines.append(f'slides_request_duration_seconds_bucket{{{label},le="{bucket}"}} {count}')
+		lines += [
+			f"slides_request_duration_seconds_sum{{{label}}} {metric['duration']}",
+			f"slides_request_duration_seconds_count{{{label}}} {metric['count']}",
+			f"slides_requests_errors_total{{{label}}} {metric['errors']}",
+			f"slides_sql_queries_total{{{label}}} {metric['queries']}",
+			f"slides_sql_duration_seconds_total{{{label}}} {metric['query_time']}",
+			f"slides_response_bytes_total{{{label}}} {metric['response_bytes']}",
+			f"slides_streamed_bytes_total{{{label}}} {metric['streamed_bytes']}",
+		]
+
+	return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+@frappe.whitelist()
+def get_profiles():
+	"""
+	Returns the most recent profiles of slow sampled calls.
+	"""
+	frappe.only_for("System Manager")
+
+	return [json.loads(profile) for profile in frappe.cache.lrange(PROFILES_CACHE_KEY, 0, -1)]
+
+
+@frappe.whitelist(methods=["POST"])
+def reset_metrics():
+	frappe.only_for("System Manager")
+
+	keys = [get_metrics_key(method) for method in get_instrumented_methods()]
+	frappe.cache.delete_value([*keys, METRICS_METHODS_CACHE_KEY, PROFILES_CACHE_KEY])
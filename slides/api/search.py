@@ -0,0 +1,253 @@
+import re
+from collections import Counter
+from html.parser import HTMLParser
+
+import frappe
+from frappe.utils import cint, now
+
+from slides.slides.doctype.presentation.presentation import (
+	get_permission_query_conditions,
+	get_presentation_thumbnails,
+)
+from slides.utils import load_elements
+
+SEARCH_DOCTYPE = "Presentation Search Term"
+
+# a match in the title counts more than one in alt text, which counts more than one in slide text
+TITLE_WEIGHT = 5
+ALT_WEIGHT = 2
+TEXT_WEIGHT = 1
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 140
+MAX_QUERY_TERMS = 10
+MAX_PAGE_LENGTH = 50
+
+STOP_WORDS = frozenset(
+	"a an and are as at be by for from has in is it its of on or that the this to was were will with".split()
+)
+
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class TextExtractor(HTMLParser):
+	"""
+	Collects the text of TipTap HTML, keeping words of adjacent blocks apart.
+	"""
+
+	def __init__(self):
+		super().__init__()
+		self.parts = []
+
+	def handle_starttag(self, tag, attrs):
+		self.parts.append(" ")
+
+	def handle_data(self, data):
+		self.parts.append(data)
+
+	def get_text(self) -> str:
+		return "".join(self.parts)
+
+
+def get_text(html: str | None) -> str:
+	extractor = TextExtractor()
+	extractor.feed(html or "")
+	extractor.close()
+	return extractor.get_text()
+
+
+def get_terms(text: str | None, weight: int = TEXT_WEIGHT) -> Counter:
+	"""
+	Returns the weighted frequency of each term in the text.
+	"""
+	terms = Counter()
+	for term in TERM_PATTERN.findall((text or "").lower()):
+		if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH and term not in STOP_WORDS:
+			terms[term] += weight
+	return terms
+
+
+def get_slide_terms(elements: str | list | None) -> Counter:
+	terms = Counter()
+	for element in elements if isinstance(elements, list) else load_elements(elements):
+		if element.get("type") == "text":
+			terms.update(get_terms(get_text(element.get("content"))))
+		if element.get("alt"):
+			terms.update(get_terms(element["alt"], ALT_WEIGHT))
+	return terms
+
+
+def get_index_rows(presentation: str, slide: str, terms: Counter) -> list[tuple]:
+	return [
+		(frappe.generate_hash(length=10), presentation, slide, term, weight) for term, weight in terms.items()
+	]
+
+
+def update_index(
+	presentation: str,
+	slides: dict[str, str | list] | None = None,
+	deleted: list[str] | None = None,
+	title: str | None = None,
+):
+	"""
+	Reindexes only the given slides of a presentation, and its title if passed.
+	- slides: map of slide name to its elements
+	- deleted: names of slides removed from the presentation
+	"""
+	slides = slides or {}
+	stale = [*slides, *(deleted or [])]
+	if title is not None:
+		# title terms are stored without a slide
+		stale.append("")
+
+	if not stale:
+		return
+
+	frappe.db.delete(SEARCH_DOCTYPE, {"presentation": presentation, "slide": ["in", stale]})
+
+	rows = []
+	if title is not None:
+		rows += get_index_rows(presentation, "", get_terms(title, TITLE_WEIGHT))
+	for slide, elements in slides.items():
+		rows += get_index_rows(presentation, slide, get_slide_terms(elements))
+
+	if not rows:
+		return
+
+	user = frappe.session.user
+	timestamp = now()
+	frappe.db.bulk_insert(
+		SEARCH_DOCTYPE,
+		fields=[
+			"name",
+			"owner",
+			"creation",
+			"modified",
+			"modified_by",
+			"presentation",
+			"slide",
+			"term",
+			"weight",
+		],
+		values=[(name, user, timestamp, timestamp, user, *values) for name, *values in rows],
+	)
+
+
+def update_presentation_index(doc):
+	"""
+	Reindexes the slides of a saved presentation whose content changed since it was loaded.
+	"""
+	previous = doc.get_doc_before_save()
+	if not previous:
+		update_index(doc.name, {slide.name: slide.elements for slide in doc.slides}, title=doc.title or "")
+		return
+
+	previous_elements = {slide.name: slide.elements for slide in previous.slides}
+	current_elements = {slide.name: slide.elements for slide in doc.slides}
+
+	changed = {
+		name: elements
+		for name, elements in current_elements.items()
+		if name not in previous_elements or previous_elements[name] != elements
+	}
+	deleted = [name for name in previous_elements if name not in current_elements]
+	title = (doc.title or "") if doc.title != previous.title else None
+
+	update_index(doc.name, changed, deleted, title)
+
+
+def delete_presentation_index(presentation: str):
+	frappe.db.delete(SEARCH_DOCTYPE, {"presentation": presentation})
+
+
+def rebuild_presentation_index(presentation: str):
+	delete_presentation_index(presentation)
+	slides = frappe.get_all(
+		"Slide",
+		filters={"parent": presentation, "parenttype": "Presentation"},
+		fields=["name", "elements"],
+		as_list=True,
+	)
+	update_index(presentation, dict(slides), title=frappe.db.get_value("Presentation", presentation, "title"))
+
+
+def get_query_terms(query: str) -> list[str]:
+	terms = []
+	for term in TERM_PATTERN.findall((query or "").lower()):
+		# stop words are not indexed, so they would never match
+		if len(term) >= MIN_TERM_LENGTH and term not in STOP_WORDS and term not in terms:
+			terms.append(term[:MAX_TERM_LENGTH])
+	return terms[:MAX_QUERY_TERMS]
+
+
+@frappe.whitelist()
+def search_presentations(query, start=0, page_length=20, include_templates=0):
+	"""
+	Returns presentations matching the query which the user can read, ranked by
+	the number of matched terms and then by their weight
+	- the last term also matches as a prefix so that results can be shown while typing
+	"""
+	terms = get_query_terms(query)
+	if not terms:
+		return []
+
+	conditions = get_permission_query_conditions(frappe.session.user)
+	if conditions is None:
+		return []
+
+	start = max(cint(start), 0)
+	page_length = min(cint(page_length) or 20, MAX_PAGE_LENGTH)
+
+	*exact_terms, prefix = terms
+	where = ["`tabPresentation`.is_template = 0"] if not cint(include_templates) else []
+	if conditions:
+		where.append(conditions)
+
+	results = frappe.db.sql(
+		f"""
+		select
+			search.presentation as name,
+			count(distinct case when search.term in %(terms)s then search.term else %(prefix)s end)
+				as matched_terms,
+			sum(search.weight) as score
+		from `tabPresentation Search Term` search
+		join `tabPresentation` on `tabPresentation`.name = search.presentation
+		where (search.term in %(terms)s or search.term like %(prefix)s)
+			{"".join(f" and {condition}" for condition in where)}
+		group by search.presentation
+		order by matched_terms desc, score desc, max(`tabPresentation`.modified) desc
+		limit %(page_length)s offset %(start)s
+		""",
+		{
+			"terms": tuple(exact_terms) or ("",),
+			# terms are word characters, of which only the underscore is a LIKE wildcard
+			"prefix": prefix.replace("_", "\\_") + "%",
+			"start": start,
+			"page_length": page_length,
+		},
+		as_dict=True,
+	)
+	if not results:
+		return []
+
+	names = [result.name for result in results]
+	details = {
+		presentation.name: presentation
+		for presentation in frappe.get_all(
+			"Presentation",
+			filters={"name": ["in", names]},
+			fields=["name", "title", "owner", "modified", "is_public"],
+		)
+	}
+	thumbnails = get_presentation_thumbnails(names)
+
+	return [
+		{
+			**details[result.name],
+			"thumbnail": thumbnails.get(result.name),
+			"matched_terms": result.matched_terms,
+			"score": cint(result.score),
+		}
+		for result in results
+		if result.name in details
+	]
@@ -0,0 +1,319 @@
+import os
+import shutil
+import uuid
+
+import frappe
+from frappe.utils import cint, now
+
+from slides.api.attachment import delete_unreferenced_files
+from slides.api.file import clear_media_cache_for_urls, get_relative_file_path
+from slides.slides.doctype.presentation.presentation import clear_composite_cache, clear_presentation_meta
+from slides.utils import dump_elements, load_elements
+
+SHARING_EVENT = "slides:set_public"
+SHARING_STATUS_CACHE_KEY = "slides:sharing_status"
+SHARING_STATUS_TTL = 60 * 60
+SHARING_LOCK_CACHE_KEY = "slides:sharing_lock"
+
+
+def get_file_path(file_url: str) -> str:
+	return frappe.get_site_path() + get_relative_file_path(file_url)
+
+
+def get_target_url(file_name: str, is_private: bool) -> str:
+	return f"/private/files/{file_name}" if is_private else f"/files/{file_name}"
+
+
+def get_element_url(file_url: str) -> str:
+	# slide elements refer to private files without the /private prefix
+	return file_url.replace("/private", "", 1)
+
+
+def is_local_file(file_url: str | None) -> bool:
+	return bool(file_url) and file_url.startswith(("/files/", "/private/files/"))
+
+
+def get_unique_file_name(file_name: str) -> str:
+	base_name, extension = os.path.splitext(file_name)
+	return f"{base_name}_{uuid.uuid4().hex[:6]}{extension}"
+
+
+def get_access_changes(name: str, is_public: bool) -> list[frappe._dict]:
+	"""
+	Plans the moves required to change the privacy of a presentation's attachments.
+	Attachments sharing a file on disk are grouped so that each file is moved once.
+	Returns one change per file on disk with its attachments and target URL.
+	"""
+	is_private = cint(not is_public)
+	attachments = frappe.get_all(
+		"File",
+		filters={
+			"attached_to_doctype": "Presentation",
+			"attached_to_name": name,
+			"is_private": cint(is_public),
+		},
+		fields=["name", "file_name", "file_url", "content_hash"],
+	)
+
+	changes = {}
+	for attachment in attachments:
+		change = changes.setdefault(
+			attachment.file_url,
+			frappe._dict(
+				source_url=attachment.file_url,
+				file_name=attachment.file_name or os.path.basename(attachment.file_url or ""),
+				content_hash=attachment.content_hash,
+				attachments=[],
+			),
+		)
+		change.attachments.append(attachment.name)
+
+	local_urls = [url for url in changes if is_local_file(url)]
+	attachment_names = [attachment.name for attachment in attachments]
+
+	# files also referred to by other docs have to stay where they are
+	shared_urls = set(
+		frappe.get_all(
+			"File",
+			filters={"file_url": ["in", local_urls], "name": ["not in", attachment_names]},
+			pluck="file_url",
+		)
+		if local_urls
+		else []
+	)
+
+	target_urls = {url: get_target_url(changes[url].file_name, is_private) for url in local_urls}
+	existing_files = {
+		file.file_url: file.content_hash
+		for file in (
+			frappe.get_all(
+				"File",
+				filters={"file_url": ["in", list(target_urls.values())]},
+				fields=["file_url", "content_hash"],
+			)
+			if target_urls
+			else []
+		)
+	}
+
+	claimed_urls = set()
+	for source_url, change in changes.items():
+		change.is_private = is_private
+		change.target_url = source_url
+		change.shared = source_url in shared_urls
+		change.reuse = False
+
+		if not is_local_file(source_url):
+			continue
+
+		target_url = target_urls[source_url]
+		if (
+			target_url in existing_files
+			and change.content_hash
+			and (existing_files[target_url] == change.content_hash)
+		):
+			# same content already exists at the target, refer to it instead of storing another copy
+			change.reuse = True
+		else:
+			while (
+				target_url in claimed_urls
+				or target_url in existing_files
+				or os.path.exists(get_file_path(target_url))
+				or frappe.db.exists("File", {"file_url": target_url})
+			):
+				target_url = get_target_url(get_unique_file_name(change.file_name), is_private)
+
+		claimed_urls.add(target_url)
+		change.target_url = target_url
+
+	return list(changes.values())
+
+
+def move_file(change: frappe._dict) -> str | None:
+	"""
+	Moves (or copies, if it is shared) the file on disk without reading it into memory.
+	Returns the path created at the target so that the move can be reverted.
+	"""
+	if change.reuse or change.target_url == change.source_url:
+		return None
+
+	source_path = get_file_path(change.source_url)
+	if not os.path.exists(source_path):
+		return None
+
+	target_path = get_file_path(change.target_url)
+	os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+	if change.shared:
+		shutil.copyfile(source_path, target_path)
+	else:
+		os.rename(source_path, target_path)
+
+	return target_path
+
+
+def revert_file_moves(moved: list[tuple[frappe._dict, str]]):
+	for change, target_path in reversed(moved):
+		if change.shared:
+			os.remove(target_path)
+		else:
+			os.rename(target_path, get_file_path(change.source_url))
+
+
+def update_file_rows(change: frappe._dict):
+	File = frappe.qb.DocType("File")
+	query = (
+		frappe.qb.update(File)
+		.set(File.is_private, change.is_private)
+		.set(File.modified, now())
+		.where(File.name.isin(change.attachments))
+	)
+	if change.target_url != change.source_url:
+		query = query.set(File.file_url, change.target_url).set(
+			File.file_name, os.path.basename(change.target_url)
+		)
+	query.run()
+
+
+def replace_urls(elements: list[dict], url_map: dict[str, str]) -> bool:
+	updated = False
+	for element in elements:
+		if element.get("type") not in ["image", "video"]:
+			continue
+
+		for attribute in ("src", "poster"):
+			if element.get(attribute) in url_map:
+				element[attribute] = url_map[element[attribute]]
+				updated = True
+
+		for variant in element.get("variants") or []:
+			if variant.get("src") in url_map:
+				variant["src"] = url_map[variant["src"]]
+				updated = True
+
+	return updated
+
+
+def update_slide_urls(name: str, url_map: dict[str, str]) -> list[dict]:
+	"""
+	Rewrites renamed file URLs in slide elements and thumbnails in a single pass.
+	Returns the updated slides.
+	"""
+	if not url_map:
+		return []
+
+	slides = frappe.get_all(
+		"Slide",
+		filters={"parent": name, "parenttype": "Presentation"},
+		fields=["name", "elements", "thumbnail"],
+	)
+
+	updated_slides = []
+	for slide in slides:
+		values = {}
+
+		elements = load_elements(slide.elements)
+		if replace_urls(elements, url_map):
+			values["elements"] = dump_elements(elements)
+
+		if slide.thumbnail in url_map:
+			values["thumbnail"] = url_map[slide.thumbnail]
+
+		if values:
+			frappe.db.set_value("Slide", slide.name, values, update_modified=False)
+			updated_slides.append({"name": slide.name, **values})
+
+	return updated_slides
+
+
+def set_sharing_status(name: str, status: dict):
+	frappe.cache.set_value(f"{SHARING_STATUS_CACHE_KEY}:{name}", status, expires_in_sec=SHARING_STATUS_TTL)
+
+
+def publish_progress(name: str, status: dict):
+	set_sharing_status(name, status)
+	frappe.publish_realtime(SHARING_EVENT, {"presentation": name, **status}, user=frappe.session.user)
+
+
+def get_sharing_status(name: str) -> dict | None:
+	return frappe.cache.get_value(f"{SHARING_STATUS_CACHE_KEY}:{name}")
+
+
+def is_access_changing(name: str) -> bool:
+	"""
+	Returns whether attachments of the presentation are being moved, during which slides cannot be saved.
+	"""
+	return bool(frappe.cache.get_value(f"{SHARING_LOCK_CACHE_KEY}:{name}"))
+
+
+def set_presentation_access(name: str, is_public: bool):
+	"""
+	Makes a presentation and its attachments public or private.
+	All renames are planned upfront, files are moved on disk without loading their content
+	and the slides are rewritten once. Moves are reverted if anything fails.
+	"""
+	is_public = cint(is_public)
+	# slides saved while files are moved would bring back the old urls, so saves are rejected until
+	# the job is done, the lock expires on its own in case the worker dies
+	lock_key = f"{SHARING_LOCK_CACHE_KEY}:{name}"
+	frappe.cache.set_value(lock_key, 1, expires_in_sec=SHARING_STATUS_TTL)
+	try:
+		apply_access_changes(name, is_public)
+	finally:
+		frappe.cache.delete_value(lock_key)
+
+
+def apply_access_changes(name: str, is_public: int):
+	changes = get_access_changes(name, is_public)
+	total = len(changes)
+
+	moved = []
+	try:
+		for progress, change in enumerate(changes, start=1):
+			target_path = move_file(change)
+			if target_path:
+				moved.append((change, target_path))
+			update_file_rows(change)
+			publish_progress(name, {"progress": progress, "total": total})
+
+		url_map = {
+			get_element_url(change.source_url): get_element_url(change.target_url)
+			for change in changes
+			if is_local_file(change.source_url)
+			and os.path.basename(change.source_url) != os.path.basename(change.target_url)
+		}
+		# the row is only locked for the final update, saves that started before the job are waited on
+		# so that their slides are rewritten as well
+		frappe.db.get_value("Presentation", name, "name", for_update=True)
+		updated_slides = update_slide_urls(name, url_map)
+
+		modified = now()
+		frappe.db.set_value(
+			"Presentation", name, {"is_public": is_public, "modified": modified}, update_modified=False
+		)
+		frappe.db.commit()
+	except Exception:
+		frappe.db.rollback()
+		revert_file_moves(moved)
+		publish_progress(name, {"done": True, "failed": True, "is_public": is_public})
+		raise
+
+	# files replaced by an existing copy at the target are no longer needed
+	delete_unreferenced_files([change.source_url for change in changes if change.reuse])
+
+	clear_media_cache_for_urls(
+		[change.source_url for change in changes] + [change.target_url for change in changes]
+	)
+	frappe.clear_document_cache("Presentation", name)
+	clear_presentation_meta(name)
+	clear_composite_cache(name)
+
+	publish_progress(
+		name,
+		{
+			"done": True,
+			"is_public": is_public,
+			"modified": modified,
+			"slides": updated_slides,
+		},
+	)
@@ -0,0 +1,54 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from slides.api.file import DEFAULT_MAX_RANGE_SIZE, MAX_RANGES, get_ranges
+
+
+class TestGetRanges(FrappeTestCase):
+	def test_single_range(self):
+		self.assertEqual(get_ranges("bytes=0-99", 1000), [(0, 99)])
+		self.assertEqual(get_ranges("bytes=500-", 1000), [(500, 999)])
+		# the end is clamped to the file
+		self.assertEqual(get_ranges("bytes=900-2000", 1000), [(900, 999)])
+
+	def test_suffix_range(self):
+		self.assertEqual(get_ranges("bytes=-100", 1000), [(900, 999)])
+		# longer than the file
+		self.assertEqual(get_ranges("bytes=-5000", 1000), [(0, 999)])
+		self.assertEqual(get_ranges("bytes=-0", 1000), [])
+
+	def test_multiple_ranges(self):
+		self.assertEqual(get_ranges("bytes=0-9, 20-29, -5", 100), [(0, 9), (20, 29), (95, 99)])
+		# overlapping ranges are served as requested
+		self.assertEqual(get_ranges("bytes=0-49,25-74", 100), [(0, 49), (25, 74)])
+		# unsatisfiable ranges are skipped
+		self.assertEqual(get_ranges("bytes=0-9,200-299", 100), [(0, 9)])
+
+	def test_unsatisfiable_ranges(self):
+		self.assertEqual(get_ranges("bytes=1000-", 1000), [])
+		self.assertEqual(get_ranges("bytes=1000-1999,2000-", 1000), [])
+
+	def test_empty_file(self):
+		self.assertEqual(get_ranges("bytes=-500", 0), [])
+		self.assertEqual(get_ranges("bytes=0-", 0), [])
+
+	def test_invalid_header(self):
+		for header in ("items=0-9", "bytes=", "bytes=a-b", "bytes=10-5", "bytes=-"):
+			self.assertIsNone(get_ranges(header, 1000), header)
+
+	def test_limits(self):
+		file_size = DEFAULT_MAX_RANGE_SIZE * 2
+		self.assertEqual(get_ranges("bytes=0-", file_size), [(0, DEFAULT_MAX_RANGE_SIZE - 1)])
+
+		header = "bytes=" + ",".join(f"{i}-{i}" for i in range(MAX_RANGES + 5))
+		self.assertEqual(len(get_ranges(header, 1000)), MAX_RANGES)
+
+	def test_max_range_size_from_site_config(self):
+		frappe.conf.slides_max_range_size = 10
+		try:
+			self.assertEqual(get_ranges("bytes=0-99", 1000), [(0, 9)])
+		finally:
+			del frappe.conf.slides_max_range_size
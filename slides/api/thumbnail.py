@@ -0,0 +1,310 @@
+import base64
+import hashlib
+import uuid
+from html.parser import HTMLParser
+from io import BytesIO
+
+import frappe
+from frappe.utils import cint, flt
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from slides.slides.doctype.presentation.presentation import (
+	clear_composite_cache,
+	delete_old_thumbnails,
+	get_unused_thumbnails,
+)
+from slides.utils import load_elements
+
+SLIDE_WIDTH = 960
+SLIDE_HEIGHT = 540
+
+
+def get_content_hash(content: bytes) -> str:
+	"""
+	Returns the hash of file content, same as the one frappe stores in File.content_hash.
+	"""
+	return hashlib.md5(content, usedforsecurity=False).hexdigest()
+
+
+def decode_base64_image(base64_data: str) -> tuple[bytes, str]:
+	header, b64 = base64_data.split(",", 1)
+	ext = header.split("/")[1].split(";")[0]
+	return base64.b64decode(b64), ext
+
+
+def save_thumbnail_file(content: bytes, ext: str, presentation: str, is_private: bool) -> str:
+	"""
+	Saves the thumbnail as an attachment of the presentation and returns its URL.
+	"""
+	file_doc = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": f"thumbnail-{uuid.uuid4().hex[:6]}.{ext}",
+			"content": content,
+			"is_private": is_private,
+			"attached_to_doctype": "Presentation",
+			"attached_to_name": presentation,
+		}
+	).insert()
+
+	return file_doc.file_url.replace("/private", "") if is_private else file_doc.file_url
+
+
+def get_thumbnail_hashes(thumbnails: list[str], is_private: bool) -> dict[str, str]:
+	"""
+	Returns a map of thumbnail URL to the content hash of its file.
+	"""
+	urls = {"/private" + url if is_private else url: url for url in thumbnails if url}
+	if not urls:
+		return {}
+
+	files = frappe.get_all(
+		"File",
+		filters={"file_url": ["in", list(urls)]},
+		fields=["file_url", "content_hash"],
+	)
+	return {urls[file.file_url]: file.content_hash for file in files}
+
+
+def ingest_thumbnails(presentation: str, thumbnails: dict[str, bytes | str]) -> dict[str, str]:
+	"""
+	Stores thumbnails for multiple slides of a presentation.
+	Thumbnails can be raw PNG content or base64 data URLs.
+	Thumbnails identical to the current ones are skipped.
+	Returns a map of slide name to its thumbnail URL.
+	"""
+	if not thumbnails:
+		return {}
+
+	is_private = not frappe.db.get_value("Presentation", presentation, "is_public")
+
+	old_thumbnails = dict(
+		frappe.get_all(
+			"Slide",
+			filters={"parent": presentation, "parenttype": "Presentation", "name": ["in", list(thumbnails)]},
+			fields=["name", "thumbnail"],
+			as_list=True,
+		)
+	)
+	old_hashes = get_thumbnail_hashes(list(old_thumbnails.values()), is_private)
+
+	saved = {}
+	to_delete = []
+	for slide_name, thumbnail in thumbnails.items():
+		if slide_name not in old_thumbnails:
+			continue
+
+		content, ext = decode_base64_image(thumbnail) if isinstance(thumbnail, str) else (thumbnail, "png")
+		old_thumbnail = old_thumbnails[slide_name]
+
+		if old_thumbnail and old_hashes.get(old_thumbnail) == get_content_hash(content):
+			saved[slide_name] = old_thumbnail
+			continue
+
+		to_delete.append(old_thumbnail)
+		saved[slide_name] = save_thumbnail_file(content, ext, presentation, is_private)
+		frappe.db.set_value("Slide", slide_name, "thumbnail", saved[slide_name], update_modified=False)
+
+	if to_delete:
+		# composites cache the thumbnail urls of their slides keyed on `modified`, which is left as is,
+		# so they are cleared before the replaced files are deleted
+		clear_composite_cache(presentation)
+		delete_old_thumbnails(presentation, get_unused_thumbnails(presentation, to_delete), is_private)
+
+	return saved
+
+
+@frappe.whitelist()
+def save_thumbnails(name: str, thumbnails: list[dict]) -> dict[str, str]:
+	"""
+	Saves thumbnails for a batch of slides separately from the slide content.
+	- thumbnails: list of slide name and its thumbnail as a base64 data URL
+	"""
+	frappe.has_permission("Presentation", "write", name, throw=True)
+
+	thumbnails = frappe.parse_json(thumbnails)
+	return ingest_thumbnails(name, {row["slide"]: row["thumbnail"] for row in thumbnails})
+
+
+class SlideTextParser(HTMLParser):
+	"""
+	Extracts paragraphs with their alignment, font size and color from TipTap HTML.
+	"""
+
+	def __init__(self):
+		super().__init__()
+		self.paragraphs = []
+
+	def get_styles(self, attrs) -> dict:
+		style = dict(attrs).get("style") or ""
+		styles = {}
+		for declaration in style.split(";"):
+			if ":" in declaration:
+				key, value = declaration.split(":", 1)
+				styles[key.strip()] = value.strip()
+		return styles
+
+	def new_paragraph(self, align="left"):
+		self.paragraphs.append({"text": "", "align": align, "font_size": None, "color": None})
+
+	def handle_starttag(self, tag, attrs):
+		styles = self.get_styles(attrs)
+
+		if tag in ("p", "li", "h1", "h2", "h3") or not self.paragraphs:
+			self.new_paragraph(styles.get("text-align", "left"))
+		elif tag == "br":
+			self.paragraphs[-1]["text"] += "\n"
+
+		paragraph = self.paragraphs[-1]
+		if not paragraph["font_size"] and styles.get("font-size"):
+			paragraph["font_size"] = flt(styles["font-size"].replace("px", ""))
+		if not paragraph["color"] and styles.get("color"):
+			paragraph["color"] = styles["color"]
+
+	def handle_data(self, data):
+		if not self.paragraphs:
+			self.new_paragraph()
+		self.paragraphs[-1]["text"] += data
+
+
+def get_font(size: float):
+	try:
+		return ImageFont.load_default(size=size)
+	except TypeError:
+		# Pillow versions before 10.1 only have a fixed size bitmap font
+		return ImageFont.load_default()
+
+
+def get_color(value: str | None, default: str = "#000000"):
+	try:
+		return ImageColor.getrgb(value or default)
+	except ValueError:
+		return ImageColor.getrgb(default)
+
+
+def wrap_text(draw, text: str, font, width: float) -> list[str]:
+	lines = []
+	for text_line in text.split("\n"):
+		line = ""
+		for word in text_line.split(" "):
+			candidate = f"{line} {word}" if line else word
+			if line and draw.textlength(candidate, font=font) > width:
+				lines.append(line)
+				line = word
+			else:
+				line = candidate
+		lines.append(line)
+	return lines
+
+
+def draw_text_element(canvas: Image.Image, element: dict):
+	parser = SlideTextParser()
+	parser.feed(element.get("content") or "")
+
+	draw = ImageDraw.Draw(canvas)
+	width = flt(element.get("width")) or SLIDE_WIDTH - flt(element.get("left"))
+	line_height = flt((element.get("editorMetadata") or {}).get("lineHeight")) or 1.5
+	top = flt(element.get("top"))
+
+	for paragraph in parser.paragraphs:
+		font_size = paragraph["font_size"] or 16
+		font = get_font(font_size)
+		color = get_color(paragraph["color"])
+
+		for line in wrap_text(draw, paragraph["text"], font, width):
+			left = flt(element.get("left"))
+			line_width = draw.textlength(line, font=font)
+			if paragraph["align"] == "center":
+				left += (width - line_width) / 2
+			elif paragraph["align"] == "right":
+				left += width - line_width
+
+			# center the glyphs vertically within the line box like the browser does
+			draw.text((left, top + font_size * (line_height - 1) / 2), line, font=font, fill=color)
+			top += font_size * line_height
+
+
+def get_local_file_path(src: str, is_public: bool) -> str | None:
+	if not src or not src.startswith(("/files", "/private/files")):
+		return None
+	if not is_public and src.startswith("/files"):
+		src = "/private" + src
+	if src.startswith("/files"):
+		src = "/public" + src
+	return frappe.get_site_path() + src
+
+
+def get_element_image_path(element: dict, is_public: bool) -> str | None:
+	attribute = "poster" if element.get("type") == "video" else "src"
+	return get_local_file_path(element.get(attribute), is_public)
+
+
+def load_image(file_path: str) -> Image.Image | None:
+	"""
+	Returns the decoded image at the path, or None if it cannot be read.
+	"""
+	try:
+		with Image.open(file_path) as image:
+			return image.convert("RGBA")
+	except OSError:
+		return None
+
+
+def draw_image_element(canvas: Image.Image, element: dict, is_public: bool, get_image=load_image):
+	file_path = get_element_image_path(element, is_public)
+	source = get_image(file_path) if file_path else None
+	if not source:
+		return
+
+	width = cint(element.get("width")) or source.width
+	height = max(1, round(source.height * width / source.width))
+	image = source.resize((width, height), Image.LANCZOS)
+
+	opacity = flt(element.get("opacity", 100)) / 100
+	if opacity < 1:
+		image.putalpha(image.getchannel("A").point(lambda alpha: int(alpha * opacity)))
+
+	canvas.alpha_composite(image, (cint(element.get("left")), cint(element.get("top"))))
+
+
+def render_slide(slide, is_public: bool, get_image=load_image) -> Image.Image:
+	"""
+	Renders an approximate image of a slide from its background and elements, without needing a browser.
+	- get_image: returns the decoded image for a file path, so that callers can share decoded media
+	"""
+	canvas = Image.new("RGBA", (SLIDE_WIDTH, SLIDE_HEIGHT), get_color(slide.background, "#ffffff"))
+
+	elements = sorted(load_elements(slide.elements), key=lambda element: cint(element.get("zIndex")))
+	for element in elements:
+		if element.get("type") == "text":
+			draw_text_element(canvas, element)
+		elif element.get("type") in ("image", "video"):
+			draw_image_element(canvas, element, is_public, get_image)
+
+	return canvas.convert("RGB")
+
+
+def render_slide_thumbnail(slide, is_public: bool) -> bytes:
+	"""
+	Renders an approximate PNG thumbnail of a slide.
+	"""
+	output = BytesIO()
+	render_slide(slide, is_public).save(output, "PNG", optimize=True)
+	return output.getvalue()
+
+
+def generate_missing_thumbnails(name: str):
+	"""
+	Renders and stores thumbnails for slides of a presentation that do not have one,
+	e.g. for presentations created without an editor session.
+	"""
+	is_public = frappe.db.get_value("Presentation", name, "is_public")
+	slides = frappe.get_all(
+		"Slide",
+		filters={"parent": name, "parenttype": "Presentation", "thumbnail": ["is", "not set"]},
+		fields=["name", "background", "elements"],
+	)
+	if not slides:
+		return
+
+	ingest_thumbnails(name, {slide.name: render_slide_thumbnail(slide, is_public) for slide in slides})
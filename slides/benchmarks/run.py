@@ -0,0 +1,302 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import frappe
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Response
+
+from slides.benchmarks.synthetic import (
+	BENCHMARK_PREFIX,
+	create_composite_deck,
+	create_synthetic_deck,
+	delete_synthetic_data,
+	get_benchmark_user,
+	get_synthetic_data,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+DEFAULT_CONFIG = {
+	"users": 2,
+	"decks": 3,
+	"slides": 20,
+	"elements": 8,
+	"media": 4,
+	"repeat": 3,
+}
+
+# allowed growth over the baseline before a metric is reported as a regression,
+# only metrics that do not depend on the machine are stored in the baseline and compared,
+# wall time is printed for reference
+DEFAULT_TOLERANCE = {
+	"queries": 0,
+	"payload": 0.1,
+}
+
+
+class BenchmarkRegression(AssertionError):
+	pass
+
+
+@contextmanager
+def count_queries():
+	"""
+	Counts queries run through `frappe.db.sql` (including query builder and ORM calls) in the block.
+	"""
+	counter = {"queries": 0}
+	sql = frappe.db.sql
+
+	def counted_sql(*args, **kwargs):
+		counter["queries"] += 1
+		return sql(*args, **kwargs)
+
+	frappe.db.sql = counted_sql
+	try:
+		yield counter
+	finally:
+		del frappe.db.sql
+
+
+@contextmanager
+def request_context(path: str, headers: dict | None = None):
+	"""
+	Sets up a request for code that reads request headers outside of a web request.
+	"""
+	previous = getattr(frappe.local, "request", None)
+	frappe.local.request = EnvironBuilder(path=path, headers=headers or {}).get_request()
+	try:
+		yield
+	finally:
+		frappe.local.request = previous
+
+
+def get_payload_size(result) -> int:
+	if isinstance(result, Response):
+		# streamed responses are consumed to measure what is actually sent
+		size = sum(len(chunk) for chunk in result.iter_encoded())
+		result.close()
+		return size
+
+	if result is None:
+		return 0
+
+	return len(frappe.as_json(result, indent=None).encode())
+
+
+def measure(name: str, fn, repeat: int = 1, user: str | None = None) -> dict:
+	"""
+	Runs the function `repeat` times and records the median wall time,
+	the maximum query count and payload size.
+	"""
+	timings, queries, payloads = [], [], []
+	for _ in range(repeat):
+		if user:
+			frappe.set_user(user)
+
+		with count_queries() as counter:
+			start = time.perf_counter()
+			result = fn()
+			payloads.append(get_payload_size(result))
+			timings.append(time.perf_counter() - start)
+
+		queries.append(counter["queries"])
+
+	timings.sort()
+	return {
+		"name": name,
+		"wall_time": round(timings[len(timings) // 2], 4),
+		"queries": max(queries),
+		"payload": max(payloads),
+	}
+
+
+def get_media_url(presentation: str) -> str:
+	return frappe.get_all(
+		"File",
+		filters={"attached_to_doctype": "Presentation", "attached_to_name": presentation},
+		pluck="file_url",
+		limit=1,
+	)[0]
+
+
+def run_benchmarks(config: dict | None = None) -> list[dict]:
+	"""
+	Creates synthetic users and decks, runs the presentation API against them and
+	returns the measurements. Everything created in the run is deleted afterwards.
+	"""
+	from slides.api.file import get_media_response
+	from slides.api.image import optimize_presentation_images
+	from slides.api.sharing import set_presentation_access
+	from slides.slides.doctype.presentation.presentation import (
+		clear_composite_cache,
+		create_presentation,
+		get_all_presentations,
+		get_composite_presentation,
+	)
+
+	config = {**DEFAULT_CONFIG, **(config or {})}
+	deck_size = {key: config[key] for key in ("slides", "elements", "media")}
+	repeat = config["repeat"]
+
+	created = get_synthetic_data()
+	results = []
+	try:
+		users = [get_benchmark_user(index, created) for index in range(config["users"])]
+		owner = users[0]
+		# the first deck belongs to the owner, who duplicates it and changes its access level
+		decks = [
+			create_synthetic_deck(created, users[index % len(users)], index, **deck_size)
+			for index in range(config["decks"])
+		]
+		public_decks = [
+			create_synthetic_deck(created, owner, config["decks"] + index, is_public=True, **deck_size)
+			for index in range(2)
+		]
+		composite = create_composite_deck(created, owner, public_decks)
+		frappe.db.commit()
+
+		def duplicate_deck():
+			presentation = create_presentation(
+				f"{BENCHMARK_PREFIX} Copy {time.time()}", duplicate_from=decks[0]
+			)
+			created.presentations.append(presentation.name)
+			return presentation
+
+		results.append(measure("create_presentation", duplicate_deck, repeat, owner))
+		results.append(measure("get_all_presentations", get_all_presentations, repeat, owner))
+		results.append(
+			measure(
+				"get_all_presentations.page", lambda: get_all_presentations(page_length=20), repeat, owner
+			)
+		)
+
+		def get_composite_uncached():
+			clear_composite_cache(composite)
+			return get_composite_presentation(composite)
+
+		results.append(measure("get_composite_presentation.uncached", get_composite_uncached, 1, "Guest"))
+		results.append(
+			measure(
+				"get_composite_presentation", lambda: get_composite_presentation(composite), repeat, "Guest"
+			)
+		)
+
+		media_url = get_media_url(public_decks[0])
+
+		def get_media(headers=None):
+			with request_context(media_url, headers):
+				return get_media_response(media_url)
+
+		results.append(measure("get_media_response", get_media, repeat, "Guest"))
+		results.append(
+			measure(
+				"get_media_response.range",
+				lambda: get_media({"Range": "bytes=0-65535"}),
+				repeat,
+				"Guest",
+			)
+		)
+
+		# jobs run inline since the enqueued work is what has to scale
+		results.append(measure("set_public", lambda: set_presentation_access(decks[0], True), 1, owner))
+		results.append(measure("optimize_images", lambda: optimize_presentation_images(decks[0]), 1, owner))
+	finally:
+		frappe.db.rollback()
+		delete_synthetic_data(created)
+
+	for result in results:
+		result["config"] = config
+
+	return results
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict[str, dict]:
+	if not os.path.exists(path):
+		return {}
+
+	with open(path) as f:
+		return {result["name"]: result for result in json.load(f)}
+
+
+def save_baseline(results: list[dict], path: str = BASELINE_PATH):
+	baseline = [
+		{key: result[key] for key in ("name", *DEFAULT_TOLERANCE, "config") if key in result}
+		for result in results
+	]
+	with open(path, "w") as f:
+		json.dump(baseline, f, indent=1)
+		f.write("\n")
+
+
+def compare_with_baseline(
+	results: list[dict], baseline: dict[str, dict], tolerance: dict | None = None
+) -> list[str]:
+	"""
+	Returns a description of each metric that grew beyond the tolerance over the baseline.
+	Baselines recorded with a different deck configuration are skipped.
+	"""
+	tolerance = {**DEFAULT_TOLERANCE, **(tolerance or {})}
+
+	regressions = []
+	for result in results:
+		expected = baseline.get(result["name"])
+		if not expected or expected.get("config") != result.get("config"):
+			continue
+
+		for metric, allowed in tolerance.items():
+			if metric not in expected:
+				continue
+
+			limit = expected[metric] * (1 + allowed)
+			if result[metric] > limit:
+				regressions.append(
+					f"{result['name']}: {metric} {result[metric]} exceeds baseline {expected[metric]}"
+					f" (+{allowed:.0%} allowed)"
+				)
+
+	return regressions
+
+
+def format_results(results: list[dict], baseline: dict[str, dict] | None = None) -> str:
+	baseline = baseline or {}
+	rows = [("benchmark", "wall time (s)", "queries", "payload (bytes)")]
+	for result in results:
+		expected = baseline.get(result["name"], {})
+		rows.append(
+			(
+				result["name"],
+				*(
+					f"{result[metric]}" + (f" ({expected[metric]})" if metric in expected else "")
+					for metric in ("wall_time", "queries", "payload")
+				),
+			)
+		)
+
+	widths = [max(len(str(row[column])) for row in rows) for column in range(len(rows[0]))]
+	return "\n".join(
+		"  ".join(str(value).ljust(width) for value, width in zip(row, widths, strict=True)) for row in rows
+	)
+
+
+def execute(config: dict | None = None, update_baseline: bool = False, baseline_path: str = BASELINE_PATH):
+	"""
+	Runs the benchmarks, prints them next to the baseline and raises on regressions.
+	Usage: bench --site <site> execute slides.benchmarks.run.execute --kwargs "{'config': {'slides': 100}}"
+	"""
+	results = run_benchmarks(config)
+	baseline = load_baseline(baseline_path)
+
+	print(format_results(results, baseline))
+
+	if update_baseline:
+		save_baseline(results, baseline_path)
+		print(f"Baseline saved to {baseline_path}")
+		return results
+
+	regressions = compare_with_baseline(results, baseline)
+	if regressions:
+		raise BenchmarkRegression("Performance regressions:\n" + "\n".join(regressions))
+
+	return results
@@ -0,0 +1,193 @@
+import io
+import random
+
+import frappe
+from PIL import Image
+
+from slides.slides.doctype.presentation.presentation import generate_element_id
+from slides.utils import dump_elements
+
+BENCHMARK_PREFIX = "Slides Benchmark"
+BENCHMARK_USER_DOMAIN = "slides-benchmark.example.com"
+
+LOREM = (
+	"Lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt "
+	"ut labore et dolore magna aliqua ut enim ad minim veniam quis nostrud exercitation"
+).split()
+
+
+def get_synthetic_data() -> frappe._dict:
+	"""
+	Returns a record of the documents created for a run, so that only those are deleted afterwards.
+	"""
+	return frappe._dict(presentations=[], users=[])
+
+
+def get_benchmark_user(index: int, created: frappe._dict) -> str:
+	"""
+	Returns a synthetic Slides user, creating it if required.
+	"""
+	email = f"user-{index}@{BENCHMARK_USER_DOMAIN}"
+	if not frappe.db.exists("User", email):
+		user = frappe.get_doc(
+			{
+				"doctype": "User",
+				"email": email,
+				"first_name": f"Benchmark User {index}",
+				"send_welcome_email": 0,
+			}
+		)
+		user.append("roles", {"role": "Slides User"})
+		user.insert(ignore_permissions=True)
+		created.users.append(email)
+
+	return email
+
+
+def get_synthetic_image(index: int, size: tuple[int, int] = (1280, 720)) -> bytes:
+	"""
+	Returns a PNG with noise so that it is not trivially compressible, like a photo.
+	"""
+	rng = random.Random(index)
+	image = Image.effect_noise(size, 64).convert("RGB")
+	image.paste(
+		(rng.randrange(256), rng.randrange(256), rng.randrange(256)), (0, 0, size[0] // 4, size[1] // 4)
+	)
+
+	buffer = io.BytesIO()
+	image.save(buffer, format="PNG")
+	return buffer.getvalue()
+
+
+def create_media_files(presentation: str, count: int, is_private: bool) -> list[frappe._dict]:
+	files = []
+	for index in range(count):
+		file_doc = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": f"benchmark-{presentation}-{index}.png",
+				"content": get_synthetic_image(index),
+				"is_private": is_private,
+				"attached_to_doctype": "Presentation",
+				"attached_to_name": presentation,
+			}
+		).insert(ignore_permissions=True)
+		files.append(frappe._dict(name=file_doc.name, file_url=file_doc.file_url))
+
+	return files
+
+
+def get_text_element(rng: random.Random, index: int) -> dict:
+	words = " ".join(rng.choice(LOREM) for _ in range(rng.randint(4, 24)))
+	return {
+		"id": generate_element_id(),
+		"type": "text",
+		"content": f"<p>{words}</p>",
+		"left": rng.randint(0, 600),
+		"top": rng.randint(0, 400),
+		"width": rng.randint(200, 600),
+		"zIndex": index,
+		"fontSize": rng.choice([16, 24, 32, 48]),
+		"color": "#000000",
+	}
+
+
+def get_image_element(rng: random.Random, index: int, file: frappe._dict) -> dict:
+	return {
+		"id": generate_element_id(),
+		"type": "image",
+		"src": file.file_url.replace("/private", "", 1),
+		"attachmentName": file.name,
+		"left": rng.randint(0, 600),
+		"top": rng.randint(0, 400),
+		"width": rng.randint(200, 600),
+		"zIndex": index,
+		"opacity": 100,
+	}
+
+
+def create_synthetic_deck(
+	created: frappe._dict,
+	owner: str,
+	index: int,
+	slides: int = 20,
+	elements: int = 8,
+	media: int = 4,
+	is_public: bool = False,
+) -> str:
+	"""
+	Creates a presentation with the given number of slides and elements per slide,
+	where images are picked from `media` attached PNGs. Returns its name.
+	"""
+	rng = random.Random(index)
+
+	frappe.set_user(owner)
+	presentation = frappe.get_doc(
+		{"doctype": "Presentation", "title": f"{BENCHMARK_PREFIX} {index}", "is_public": is_public}
+	).insert()
+	created.presentations.append(presentation.name)
+
+	files = create_media_files(presentation.name, media, not is_public)
+
+	for _ in range(slides):
+		slide_elements = []
+		for element_index in range(elements):
+			# roughly one in four elements is an image when there is media to use
+			if files and rng.random() < 0.25:
+				slide_elements.append(get_image_element(rng, element_index, rng.choice(files)))
+			else:
+				slide_elements.append(get_text_element(rng, element_index))
+
+		presentation.append(
+			"slides",
+			{
+				"background": "#ffffff",
+				"elements": dump_elements(slide_elements),
+				"transition": "None",
+				"transition_duration": 0,
+			},
+		)
+
+	presentation.save()
+	return presentation.name
+
+
+def create_composite_deck(created: frappe._dict, owner: str, references: list[str]) -> str:
+	frappe.set_user(owner)
+	presentation = frappe.get_doc(
+		{
+			"doctype": "Presentation",
+			"title": f"{BENCHMARK_PREFIX} Composite",
+			"is_composite": 1,
+			"is_public": 1,
+			"reference_presentations": [{"presentation": reference} for reference in references],
+		}
+	).insert()
+	created.presentations.append(presentation.name)
+
+	return presentation.name
+
+
+def delete_synthetic_data(created: frappe._dict):
+	"""
+	Deletes the presentations, their files and the users created in a run.
+	"""
+	frappe.set_user("Administrator")
+
+	presentations = list(created.presentations)
+	# composites go first since they link to the other presentations
+	presentations.sort(key=lambda name: not frappe.db.get_value("Presentation", name, "is_composite"))
+	for name in presentations:
+		frappe.delete_doc("Presentation", name, force=True, ignore_permissions=True)
+
+	for name in frappe.get_all(
+		"File",
+		filters={"attached_to_doctype": "Presentation", "attached_to_name": ["in", presentations]},
+		pluck="name",
+	):
+		frappe.delete_doc("File", name, force=True, ignore_permissions=True)
+
+	for email in created.users:
+		frappe.delete_doc("User", email, force=True, ignore_permissions=True)
+
+	frappe.db.commit()
@@ -0,0 +1,40 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import os
+import tempfile
+
+from frappe.tests.utils import FrappeTestCase
+
+from slides.benchmarks.run import compare_with_baseline, load_baseline, save_baseline
+
+# the benchmarks themselves create and commit data, they are only run with `bench slides-benchmark`
+SMALL_DECKS = {"users": 1, "decks": 1, "slides": 5, "elements": 4, "media": 1, "repeat": 1}
+
+
+class TestBenchmarks(FrappeTestCase):
+	def test_compare_with_baseline(self):
+		baseline = {"endpoint": {"name": "endpoint", "queries": 10, "payload": 100, "config": SMALL_DECKS}}
+
+		# wall time depends on the machine and is not compared
+		result = {"name": "endpoint", "wall_time": 5.0, "queries": 10, "payload": 105, "config": SMALL_DECKS}
+		self.assertEqual(compare_with_baseline([result], baseline), [])
+
+		result = {**result, "queries": 11}
+		self.assertEqual(len(compare_with_baseline([result], baseline)), 1)
+
+		# baselines of another deck configuration are not comparable
+		result = {**result, "config": {**SMALL_DECKS, "slides": 50}}
+		self.assertEqual(compare_with_baseline([result], baseline), [])
+
+	def test_baseline_stores_only_comparable_metrics(self):
+		result = {"name": "endpoint", "wall_time": 1.0, "queries": 10, "payload": 100, "config": SMALL_DECKS}
+
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "baseline.json")
+			save_baseline([result], path)
+			baseline = load_baseline(path)
+
+		self.assertEqual(
+			baseline, {"endpoint": {"name": "endpoint", "queries": 10, "payload": 100, "config": SMALL_DECKS}}
+		)
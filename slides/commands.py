@@ -0,0 +1,30 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("slides-benchmark")
+@click.option("--users", type=int, help="Number of synthetic users")
+@click.option("--decks", type=int, help="Number of synthetic presentations")
+@click.option("--slides", type=int, help="Slides per presentation")
+@click.option("--elements", type=int, help="Elements per slide")
+@click.option("--media", type=int, help="Images attached to each presentation")
+@click.option("--repeat", type=int, help="Runs per benchmark")
+@click.option("--update-baseline", is_flag=True, default=False, help="Save the results as the new baseline")
+@pass_context
+def slides_benchmark(context, update_baseline=False, **config):
+	"""Benchmark the presentation API against synthetic decks and compare with the stored baseline"""
+	from slides.benchmarks.run import BenchmarkRegression, execute
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		execute({key: value for key, value in config.items() if value is not None}, update_baseline)
+	except BenchmarkRegression as e:
+		raise click.ClickException(str(e)) from e
+	finally:
+		frappe.destroy()
+
+
+commands = [slides_benchmark]
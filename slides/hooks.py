@@ -136,34 +136,21 @@ has_permission = {
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# 	}
-# }
+doc_events = {
+	"File": {
+		"on_update": "slides.api.file.clear_media_cache",
+		"on_trash": "slides.api.file.clear_media_cache",
+	}
+}
 
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-# 	"all": [
-# 		"slides.tasks.all"
-# 	],
-# 	"daily": [
-# 		"slides.tasks.daily"
-# 	],
-# 	"hourly": [
-# 		"slides.tasks.hourly"
-# 	],
-# 	"weekly": [
-# 		"slides.tasks.weekly"
-# 	],
-# 	"monthly": [
-# 		"slides.tasks.monthly"
-# 	],
-# }
+scheduler_events = {
+	"daily_long": [
+		"slides.api.attachment.delete_orphan_attachments",
+	],
+}
 
 # Testing
 # -------
@@ -195,8 +182,9 @@ has_permission = {
 
 # Request Events
 # ----------------
-# before_request = ["slides.utils.before_request"]
-# after_request = ["slides.utils.after_request"]
+# records latency, queries and response size of Slides endpoints if `slides_instrumentation` is set
+before_request = ["slides.api.metrics.before_request"]
+after_request = ["slides.api.metrics.after_request"]
 
 # Job Events
 # ----------
@@ -0,0 +1,75 @@
+import time
+
+import frappe
+
+BATCH_SIZE = 500
+
+# progress is printed at most this often in seconds, the summary is always printed
+REPORT_INTERVAL = 5
+
+
+def get_cursor_key(patch: str) -> str:
+	return f"slides_migration:{patch}"
+
+
+def report_progress(patch: str, processed: int, total: int, updated: int, elapsed: float):
+	rate = processed / elapsed if elapsed else 0
+	print(f"{patch}: {processed}/{total} slides, {updated} updated, {rate:.0f} slides/s")
+
+
+def migrate_slides(
+	patch: str,
+	transform,
+	fields: tuple[str, ...] = ("elements", "thumbnail"),
+	batch_size: int = BATCH_SIZE,
+) -> frappe._dict:
+	"""
+	Streams slides in batches ordered by name and writes the values returned by `transform`
+	with bulk updates, without loading presentations or running their hooks.
+	Each batch is committed along with a cursor, so an interrupted patch resumes after the last batch.
+	- transform: receives a slide with its name and `fields`, returns a dict of changed values or None
+	"""
+	cursor_key = get_cursor_key(patch)
+	last_name = frappe.db.get_global(cursor_key) or ""
+	if last_name:
+		print(f"{patch}: resuming after slide {last_name}")
+
+	total = frappe.db.count("Slide", {"name": [">", last_name]})
+	processed, updated = 0, 0
+	start = last_report = time.perf_counter()
+
+	while True:
+		slides = frappe.get_all(
+			"Slide",
+			filters={"name": [">", last_name]},
+			fields=["name", *fields],
+			order_by="name asc",
+			limit=batch_size,
+		)
+		if not slides:
+			break
+
+		updates = {}
+		for slide in slides:
+			changes = transform(slide)
+			if changes:
+				updates[slide.name] = changes
+
+		if updates:
+			frappe.db.bulk_update("Slide", updates, chunk_size=batch_size, update_modified=False)
+
+		last_name = slides[-1].name
+		frappe.db.set_global(cursor_key, last_name)
+		frappe.db.commit()
+
+		processed += len(slides)
+		updated += len(updates)
+		if time.perf_counter() - last_report >= REPORT_INTERVAL:
+			report_progress(patch, processed, total, updated, time.perf_counter() - start)
+			last_report = time.perf_counter()
+
+	frappe.db.set_global(cursor_key, None)
+	frappe.db.commit()
+
+	report_progress(patch, processed, total, updated, time.perf_counter() - start)
+	return frappe._dict(processed=processed, updated=updated)
@@ -0,0 +1,10 @@
+from slides.slides.doctype.presentation.presentation import on_doctype_update as add_presentation_indexes
+from slides.slides.doctype.slide.slide import on_doctype_update as add_slide_indexes
+
+
+def execute():
+	"""
+	Adds the composite indexes used by presentation listing and slide loading on existing sites.
+	"""
+	add_presentation_indexes()
+	add_slide_indexes()
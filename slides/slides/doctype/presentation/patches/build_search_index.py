@@ -0,0 +1,29 @@
+import frappe
+
+from slides.api.search import rebuild_presentation_index
+
+BATCH_SIZE = 500
+
+
+def execute():
+	"""
+	Indexes the content of existing presentations for search.
+	"""
+	last_name = ""
+
+	while True:
+		presentations = frappe.get_all(
+			"Presentation",
+			filters={"name": [">", last_name]},
+			order_by="name asc",
+			limit=BATCH_SIZE,
+			pluck="name",
+		)
+		if not presentations:
+			break
+
+		for presentation in presentations:
+			rebuild_presentation_index(presentation)
+
+		frappe.db.commit()
+		last_name = presentations[-1]
@@ -0,0 +1,32 @@
+from slides.migration import migrate_slides
+from slides.utils import dump_elements, load_elements
+
+
+def execute():
+	"""
+	Rewrites slide elements stored as indented JSON in the compact storage format.
+	"""
+	size = {"before": 0, "after": 0}
+
+	def compact_slide(slide) -> dict | None:
+		if not slide.elements:
+			return None
+
+		try:
+			compact = dump_elements(load_elements(slide.elements))
+		except ValueError:
+			return None
+
+		if compact == slide.elements:
+			return None
+
+		size["before"] += len(slide.elements.encode())
+		size["after"] += len(compact.encode())
+		return {"elements": compact}
+
+	migrate_slides("compact_slide_elements", compact_slide, fields=("elements",))
+
+	print(
+		f"Compacted slide elements: saved {size['before'] - size['after']} bytes"
+		f" ({size['before']} -> {size['after']})"
+	)
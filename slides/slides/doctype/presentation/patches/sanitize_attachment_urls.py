@@ -1,29 +1,41 @@
-import json
+from slides.migration import migrate_slides
+from slides.utils import dump_elements, load_elements
 
-import frappe
 
+def get_public_url(url: str | None) -> str | None:
+	if url and url.startswith("/private"):
+		return url.replace("/private", "", 1)
+	return url
 
-def execute():
-	presentations = frappe.get_all("Presentation", pluck="name")
 
-	for presentation in presentations:
-		doc = frappe.get_doc("Presentation", presentation)
+def sanitize_slide(slide) -> dict:
+	changes = {}
+
+	thumbnail = get_public_url(slide.thumbnail)
+	if thumbnail != slide.thumbnail:
+		changes["thumbnail"] = thumbnail
 
-		for slide in doc.slides:
-			if slide.thumbnail and slide.thumbnail.startswith("/private"):
-				slide.thumbnail = slide.thumbnail.replace("/private", "")
+	elements = load_elements(slide.elements)
+	changed = False
 
-			elements = json.loads(slide.elements or "[]")
+	for element in elements:
+		if element.get("type") not in ("image", "video"):
+			continue
 
-			for element in elements:
-				if element.get("type") in ("image", "video"):
-					url = element.get("src", "")
-					if url.startswith("/private"):
-						element["src"] = url.replace("/private", "")
+		for field in ("src", "poster"):
+			url = get_public_url(element.get(field))
+			if url != element.get(field):
+				element[field] = url
+				changed = True
 
-					if element.get("poster", "").startswith("/private"):
-						element["poster"] = element["poster"].replace("/private", "")
+	if changed:
+		changes["elements"] = dump_elements(elements)
 
-			slide.elements = json.dumps(elements, indent=2)
+	return changes
 
-		doc.save()
+
+def execute():
+	"""
+	Strips the private prefix from attachment URLs stored in slides.
+	"""
+	migrate_slides("sanitize_attachment_urls", sanitize_slide)
@@ -2,14 +2,18 @@
 # For license information, please see license.txt
 
 import base64
-import json
 import random
 import string
 import uuid
 
 import frappe
-from frappe.core.doctype.file.file import get_local_image
 from frappe.model.document import Document
+from frappe.utils import cint, get_datetime, now
+from frappe.utils.caching import request_cache
+from werkzeug.wrappers import Response
+
+from slides.api.attachment import bulk_attach_file_references, delete_unreferenced_files
+from slides.utils import dump_elements, load_elements
 
 
 class Presentation(Document):
@@ -19,20 +23,51 @@ class Presentation(Document):
 			self.is_public = 1
 
 	def update_thumbnails(self):
+		"""
+		Saves base64 thumbnails of slides as files and deletes the files of replaced thumbnails.
+		Slides are matched with their previous version by name so that reordering does not replace files.
+		Number of files written and deleted are set in `flags.thumbnail_stats`.
+		"""
 		doc_before_save = self.get_doc_before_save()
 		is_private = not self.is_public
-		if not doc_before_save or not doc_before_save.slides:
-			return
-		old_slides = doc_before_save.slides
+		old_thumbnails = (
+			{slide.name: slide.thumbnail for slide in doc_before_save.slides} if doc_before_save else {}
+		)
+
+		written = 0
+		to_delete = []
 
 		for slide in self.slides:
-			old_slide = old_slides[slide.idx - 1] if slide.idx <= len(old_slides) else None
-			if not old_slide:
-				continue
 			if slide.thumbnail and slide.thumbnail.startswith("data:image"):
-				old_thumbnail = old_slide.thumbnail
-				delete_old_thumbnail(old_thumbnail, is_private)
+				to_delete.append(old_thumbnails.get(slide.name))
 				slide.thumbnail = save_base64_thumbnail(slide.thumbnail, self.name, "thumbnail", is_private)
+				written += 1
+
+		# thumbnails of removed slides
+		current_slides = {slide.name for slide in self.slides}
+		to_delete += [thumbnail for name, thumbnail in old_thumbnails.items() if name not in current_slides]
+
+		# a thumbnail can still be in use by another slide
+		in_use = {slide.thumbnail for slide in self.slides}
+		deleted = delete_old_thumbnails(
+			self.name, [url for url in to_delete if url not in in_use], is_private
+		)
+
+		self.flags.thumbnail_stats = {"written": written, "deleted": deleted}
+
+	def on_update(self):
+		from slides.api.search import update_presentation_index
+
+		clear_presentation_meta(self.name)
+		clear_composite_cache(self.name)
+		update_presentation_index(self)
+
+	def on_trash(self):
+		from slides.api.search import delete_presentation_index
+
+		clear_presentation_meta(self.name)
+		clear_composite_cache(self.name)
+		delete_presentation_index(self.name)
 
 	def validate(self):
 		if self.is_composite:
@@ -41,11 +76,11 @@ class Presentation(Document):
 					"Please add at least one reference presentation to create a composite presentation."
 				)
 
+			references = get_presentations_meta([ref.presentation for ref in self.reference_presentations])
 			for ref in self.reference_presentations:
-				ref_doc = frappe.get_cached_doc("Presentation", ref.presentation)
-				is_public = ref_doc.is_public
-				ref_name = ref_doc.title
-				if not is_public:
+				ref_meta = references.get(ref.presentation)
+				if not ref_meta or not ref_meta.is_public:
+					ref_name = ref_meta.title if ref_meta else ref.presentation
 					frappe.throw(
 						f"Reference presentation '{ref_name}' must be public to create a composite presentation."
 					)
@@ -53,14 +88,124 @@ class Presentation(Document):
 		self.update_thumbnails()
 
 
-def delete_old_thumbnail(old_thumbnail: str | None = None, is_private: bool = False):
-	if old_thumbnail and old_thumbnail.startswith("/files"):
-		try:
-			url = "/private" + old_thumbnail if is_private else old_thumbnail
-			file_docname = frappe.db.get_value("File", {"file_url": url})
-			frappe.delete_doc("File", file_docname)
-		except Exception as e:
-			frappe.log_error(f"Failed to remove old thumbnail: {e}")
+PRESENTATION_META_CACHE_KEY = "slides:presentation_meta"
+PRESENTATION_META_FIELDS = [
+	"name",
+	"title",
+	"slug",
+	"theme",
+	"owner",
+	"is_template",
+	"is_public",
+	"is_composite",
+	"modified",
+]
+
+
+def get_presentations_meta(names: list[str]) -> dict[str, frappe._dict]:
+	"""
+	Returns the title, access level, modified timestamp and slide count of presentations
+	without loading their documents. Cached until the presentation is saved or deleted.
+	"""
+	meta, missing = {}, []
+	for name in set(filter(None, names)):
+		cached = frappe.cache.hget(PRESENTATION_META_CACHE_KEY, name)
+		if cached:
+			meta[name] = frappe._dict(cached)
+		else:
+			missing.append(name)
+
+	if not missing:
+		return meta
+
+	slide_counts = dict(
+		frappe.get_all(
+			"Slide",
+			filters={"parent": ["in", missing], "parenttype": "Presentation"},
+			fields=["parent", "count(name) as slide_count"],
+			group_by="parent",
+			as_list=True,
+		)
+	)
+
+	for presentation in frappe.get_all(
+		"Presentation", filters={"name": ["in", missing]}, fields=PRESENTATION_META_FIELDS
+	):
+		presentation.slide_count = slide_counts.get(presentation.name, 0)
+		frappe.cache.hset(PRESENTATION_META_CACHE_KEY, presentation.name, presentation)
+		meta[presentation.name] = presentation
+
+	return meta
+
+
+def get_presentation_meta(name: str) -> frappe._dict | None:
+	return get_presentations_meta([name]).get(name)
+
+
+def clear_presentation_meta(name: str):
+	frappe.cache.hdel(PRESENTATION_META_CACHE_KEY, name)
+
+
+def has_meta_permission(meta: frappe._dict, ptype: str = "read") -> bool:
+	"""
+	Checks permission on a presentation using its metadata instead of loading the document,
+	the controller check only needs the owner and template flag.
+	"""
+	return bool(frappe.has_permission("Presentation", ptype) and has_permission(meta, ptype))
+
+
+def delete_old_thumbnails(presentation: str, thumbnails: list[str | None], is_private: bool = False) -> int:
+	"""
+	Deletes the thumbnail files attached to a presentation in a batch.
+	Returns the number of deleted files.
+	"""
+	urls = {
+		"/private" + thumbnail if is_private else thumbnail
+		for thumbnail in thumbnails
+		if thumbnail and thumbnail.startswith("/files")
+	}
+	if not urls:
+		return 0
+
+	try:
+		files = frappe.get_all(
+			"File",
+			filters={
+				"attached_to_doctype": "Presentation",
+				"attached_to_name": presentation,
+				"file_url": ["in", list(urls)],
+			},
+			pluck="name",
+		)
+		if not files:
+			return 0
+
+		frappe.db.delete("File", {"name": ["in", files]})
+		delete_unreferenced_files(list(urls))
+	except Exception as e:
+		frappe.log_error(f"Failed to remove old thumbnails: {e}")
+		return 0
+
+	return len(files)
+
+
+def get_unused_thumbnails(presentation: str, thumbnails: list[str | None]) -> list[str]:
+	"""
+	Returns the thumbnails that no slide of the presentation uses anymore,
+	since duplicated slides share the thumbnail file of the slide they were copied from.
+	"""
+	thumbnails = [thumbnail for thumbnail in thumbnails if thumbnail]
+	if not thumbnails:
+		return []
+
+	in_use = set(
+		frappe.get_all(
+			"Slide",
+			filters={"parent": presentation, "parenttype": "Presentation", "thumbnail": ["in", thumbnails]},
+			pluck="thumbnail",
+		)
+	)
+	return [thumbnail for thumbnail in thumbnails if thumbnail not in in_use]
 
 
 @frappe.whitelist()
@@ -87,30 +232,61 @@ def slug(text: str) -> str:
 	return text.lower().replace(" ", "-")
 
 
-def get_presentation_thumbnail(presentation_name: str, index: int | None = 1) -> str:
-	"""Returns the thumbnail of the first slide in a presentation"""
-	return frappe.get_value(
+def get_presentation_thumbnails(presentations: dict[str, int] | list[str]) -> dict[str, str]:
+	"""
+	Returns a map of presentation name to thumbnail for a list of presentations in a single query.
+	- presentations can be a list of names (first slide is used) or a map of name to slide index
+	"""
+	if not isinstance(presentations, dict):
+		presentations = {name: 1 for name in presentations}
+
+	if not presentations:
+		return {}
+
+	slides = frappe.get_all(
 		"Slide",
-		{"parent": presentation_name, "idx": index},
-		"thumbnail",
+		fields=["parent", "idx", "thumbnail"],
+		filters={
+			"parenttype": "Presentation",
+			"parent": ["in", list(presentations)],
+			"idx": ["in", list(set(presentations.values()))],
+		},
 	)
 
+	return {slide.parent: slide.thumbnail for slide in slides if presentations.get(slide.parent) == slide.idx}
+
 
 @frappe.whitelist()
-def get_all_presentations() -> list[dict]:
+def get_all_presentations(
+	page_length: int | None = None, cursor: str | None = None, cursor_name: str | None = None
+) -> list[dict]:
 	"""
 	Returns a list of presentation details
 	- info and first thumbnail
+	- page_length limits the number of presentations returned (all by default)
+	- cursor and cursor_name are the `modified` timestamp and name of the last presentation of the previous page
 	"""
+	filters = {"owner": frappe.session.user, "is_template": 0}
+	or_filters = None
+	if cursor and cursor_name:
+		# presentations modified at the same time as the last one are continued by name
+		filters["modified"] = ["<=", cursor]
+		or_filters = [["modified", "<", cursor], ["name", "<", cursor_name]]
+	elif cursor:
+		filters["modified"] = ["<", cursor]
+
 	presentations = frappe.get_list(
 		"Presentation",
 		fields=["name", "title", "owner", "creation", "modified_by", "modified", "is_public"],
-		filters={"owner": frappe.session.user, "is_template": 0},
-		order_by="modified desc",
+		filters=filters,
+		or_filters=or_filters,
+		order_by="modified desc, name desc",
+		page_length=cint(page_length),
 	)
 
+	thumbnails = get_presentation_thumbnails([presentation["name"] for presentation in presentations])
 	for presentation in presentations:
-		presentation["thumbnail"] = get_presentation_thumbnail(presentation["name"])
+		presentation["thumbnail"] = thumbnails.get(presentation["name"])
 
 	return presentations
 
@@ -130,67 +306,137 @@ def get_slide_thumbnails(presentation: str) -> list[str]:
 	return [slide["thumbnail"] for slide in slides]
 
 
-def apply_slide_layout(slide, ref_id):
-	layout_slide = frappe.get_doc("Slide", ref_id)
-
-	slide.update(layout_slide.as_dict())
-
-	elements = json.loads(layout_slide.elements)
-	for element in elements:
-		element["id"] = "".join(random.choices(string.ascii_lowercase + string.digits, k=9))
+def generate_element_id() -> str:
+	return "".join(random.choices(string.ascii_lowercase + string.digits, k=9))
 
-	slide.elements = json.dumps(elements)
 
-
-def create_new_slide(parent, ref_id, copy_thumbnail=False):
+def get_used_attachments(source: str, slides: list[dict]) -> list[dict]:
 	"""
-	Creates a new slide with the given reference slide id.
+	Returns the attachments of the source presentation used by elements or thumbnails of the slides.
 	"""
-	slide = frappe.new_doc("Slide")
-
-	apply_slide_layout(slide, ref_id)
-
-	if not copy_thumbnail:
-		slide.thumbnail = ""
-
-	slide.parent = parent
-	slide.parentfield = "slides"
-	slide.parenttype = "Presentation"
-	slide.save()
-
-	return slide
-
-
-def get_slides_from_ref(parent, theme, duplicate_from):
-	ref_name = duplicate_from or theme or "Light"
-	ref_presentation = frappe.get_doc("Presentation", ref_name)
+	attachment_names, file_urls = set(), set()
+	for slide in slides:
+		file_urls.add(slide.thumbnail)
+		for element in slide.elements:
+			if element.get("type") in ["image", "video"]:
+				attachment_names.add(element.get("attachmentName"))
 
-	slides = []
+	files = frappe.get_all(
+		"File",
+		filters={"attached_to_doctype": "Presentation", "attached_to_name": source},
+		fields=["name", "file_name", "file_url", "is_private", "content_hash", "file_size"],
+	)
+	return [
+		file
+		for file in files
+		if file.name in attachment_names or file.file_url.replace("/private", "") in file_urls
+	]
 
-	if duplicate_from:
-		for slide in ref_presentation.slides:
-			new_slide = create_new_slide(parent, slide.name, True)
-			new_slide.idx = slide.idx
-			slides.append(new_slide)
-	else:
-		first_index = 2 if ref_presentation.title in ("Light", "Dark") else 0
-		first_slide = create_new_slide(parent, ref_presentation.slides[first_index].name)
-		first_slide.idx = 1
-		slides.append(first_slide)
 
-	return slides
+def duplicate_slides(presentation: str, source: str, slide_index: int | None = None, copy_thumbnails=True):
+	"""
+	Copies slides of the source presentation to the presentation with a single insert.
+	Element ids are regenerated and media attachments are re-pointed to the new presentation.
+	- slide_index: only the slide at this position is copied if set
+	"""
+	slides = frappe.get_all(
+		"Slide",
+		filters={"parent": source, "parenttype": "Presentation"},
+		fields=["background", "elements", "thumbnail", "transition", "transition_duration"],
+		order_by="idx",
+	)
+	if slide_index is not None:
+		slides = slides[slide_index : slide_index + 1]
+
+	for slide in slides:
+		slide.elements = load_elements(slide.elements)
+		for element in slide.elements:
+			element["id"] = generate_element_id()
+		if not copy_thumbnails:
+			slide.thumbnail = ""
+
+	attachments = bulk_attach_file_references(presentation, get_used_attachments(source, slides))
+
+	from slides.api.search import update_index
+
+	user = frappe.session.user
+	timestamp = now()
+	values = []
+	indexed_slides = {}
+
+	for idx, slide in enumerate(slides, start=1):
+		for element in slide.elements:
+			if element.get("attachmentName") in attachments:
+				element["attachmentName"] = attachments[element["attachmentName"]]
+
+		slide_name = frappe.generate_hash(length=10)
+		indexed_slides[slide_name] = slide.elements
+		values.append(
+			(
+				slide_name,
+				user,
+				timestamp,
+				timestamp,
+				user,
+				presentation,
+				"slides",
+				"Presentation",
+				idx,
+				slide.background,
+				dump_elements(slide.elements),
+				slide.thumbnail,
+				slide.transition,
+				slide.transition_duration,
+			)
+		)
+
+	frappe.db.bulk_insert(
+		"Slide",
+		fields=[
+			"name",
+			"owner",
+			"creation",
+			"modified",
+			"modified_by",
+			"parent",
+			"parentfield",
+			"parenttype",
+			"idx",
+			"background",
+			"elements",
+			"thumbnail",
+			"transition",
+			"transition_duration",
+		],
+		values=values,
+	)
+	update_index(presentation, indexed_slides)
 
 
 @frappe.whitelist()
 def create_presentation(title, theme=None, duplicate_from=None):
+	source = duplicate_from or theme or "Light"
+	frappe.has_permission("Presentation", "read", source, throw=True)
+
 	presentation = frappe.new_doc("Presentation")
 	presentation.title = title
 	presentation.theme = theme
 	presentation.insert()
 
-	presentation.slides = get_slides_from_ref(presentation.name, theme, duplicate_from)
+	if duplicate_from:
+		duplicate_slides(presentation.name, source)
+	else:
+		source_title = frappe.db.get_value("Presentation", source, "title")
+		first_index = 2 if source_title in ("Light", "Dark") else 0
+		duplicate_slides(presentation.name, source, slide_index=first_index, copy_thumbnails=False)
+
+	if frappe.conf.get("slides_server_thumbnails"):
+		frappe.enqueue(
+			"slides.api.thumbnail.generate_missing_thumbnails",
+			name=presentation.name,
+			enqueue_after_commit=True,
+		)
 
-	presentation.save()
 	return presentation
 
 
@@ -201,36 +447,250 @@ def delete_presentation(name):
 
 @frappe.whitelist()
 def update_title(name, title):
-	frappe.set_value("Presentation", name, "title", title)
-	return slug(title)
+	"""
+	Returns the slug of the new title and the new modified timestamp, which the editor needs for its next save
+	"""
+	doc = frappe.get_doc("Presentation", name)
+	doc.title = title
+	doc.save()
+	return {"slug": slug(title), "modified": doc.modified}
+
+
+SLIDE_FIELDS = ("background", "elements", "thumbnail", "transition", "transition_duration")
+
+
+def get_slide_values(slide: dict) -> dict:
+	return {field: slide[field] for field in SLIDE_FIELDS if field in slide}
+
+
+@frappe.whitelist()
+def save_slides(
+	name: str,
+	modified: str,
+	slides: list[dict] | None = None,
+	deleted: list[str] | None = None,
+	order: list[dict] | None = None,
+) -> dict:
+	"""
+	Saves only the changed slides of a presentation instead of rewriting the whole document
+	- slides: changed slides (with name) and new slides (without name) along with their idx
+	- deleted: names of slides removed from the presentation
+	- order: name and idx of unchanged slides that were moved
+	Throws if the presentation was modified by someone else after `modified`
+	"""
+	from slides.api.sharing import is_access_changing
+
+	frappe.has_permission("Presentation", "write", name, throw=True)
+
+	if is_access_changing(name):
+		frappe.throw("The access level of this presentation is being changed. Please try again in a moment.")
+
+	slides = frappe.parse_json(slides or [])
+	deleted = frappe.parse_json(deleted or [])
+	order = frappe.parse_json(order or [])
+
+	current_modified, is_public = frappe.db.get_value(
+		"Presentation", name, ["modified", "is_public"], for_update=True
+	)
+	if get_datetime(current_modified) != get_datetime(modified):
+		frappe.throw(
+			"Presentation has been modified after you opened it. Please reload to get the latest changes.",
+			frappe.TimestampMismatchError,
+		)
+
+	is_private = not is_public
+	old_thumbnails = dict(
+		frappe.get_all(
+			"Slide",
+			filters={"parent": name, "parenttype": "Presentation"},
+			fields=["name", "thumbnail"],
+			as_list=True,
+		)
+	)
+
+	def validate_slide_name(slide_name):
+		if slide_name not in old_thumbnails:
+			frappe.throw(f"Slide {slide_name} does not belong to presentation {name}")
+
+	from slides.api.search import update_index
+
+	thumbnails_to_delete = []
+	indexed_slides = {}
 
+	if deleted:
+		for slide_name in deleted:
+			validate_slide_name(slide_name)
+			thumbnails_to_delete.append(old_thumbnails[slide_name])
+		frappe.db.delete("Slide", {"parent": name, "name": ["in", deleted]})
 
-def get_attachment(presentation, file_url):
+	saved_slides = []
+	for slide in slides:
+		values = get_slide_values(slide)
+		values["idx"] = cint(slide.get("idx"))
+
+		thumbnail = values.get("thumbnail")
+		if thumbnail and thumbnail.startswith("data:image"):
+			if slide.get("name"):
+				thumbnails_to_delete.append(old_thumbnails.get(slide["name"]))
+			values["thumbnail"] = save_base64_thumbnail(thumbnail, name, "thumbnail", is_private)
+
+		if slide.get("name"):
+			validate_slide_name(slide["name"])
+			frappe.db.set_value("Slide", slide["name"], values)
+			slide_name = slide["name"]
+		else:
+			new_slide = frappe.new_doc("Slide")
+			new_slide.update(values)
+			new_slide.parent = name
+			new_slide.parentfield = "slides"
+			new_slide.parenttype = "Presentation"
+			new_slide.insert()
+			slide_name = new_slide.name
+
+		if "elements" in values:
+			indexed_slides[slide_name] = values["elements"]
+
+		saved_slide = {"name": slide_name, "idx": values["idx"]}
+		if "thumbnail" in values:
+			saved_slide["thumbnail"] = values["thumbnail"]
+		saved_slides.append(saved_slide)
+
+	for slide in order:
+		validate_slide_name(slide["name"])
+		frappe.db.set_value("Slide", slide["name"], "idx", cint(slide["idx"]), update_modified=False)
+
+	delete_old_thumbnails(name, get_unused_thumbnails(name, thumbnails_to_delete), is_private)
+	update_index(name, indexed_slides, deleted)
+
+	modified = now()
+	frappe.db.set_value(
+		"Presentation",
+		name,
+		{"modified": modified, "modified_by": frappe.session.user},
+		update_modified=False,
+	)
+	frappe.clear_document_cache("Presentation", name)
+	clear_presentation_meta(name)
+
+	return {"modified": modified, "slides": saved_slides}
+
+
+def resolve_attachments(presentation: str, file_urls: set[str]) -> dict[str, str]:
 	"""
-	Returns the attachment name for a file URL in a presentation.
+	Returns a map of file URL to the name of its attachment in the presentation.
+	Files of other presentations the user can read, from where elements were copied, are attached in bulk
+	unless the presentation already has an attachment with the same content.
 	"""
-	# if file is already attached to the presentation, return its name
-	attachment = frappe.get_value("File", {"file_url": file_url, "attached_to_name": presentation}, "name")
+	candidates = {}
+	for file_url in file_urls:
+		candidates[file_url] = file_url
+		if file_url.startswith("/files"):
+			candidates.setdefault("/private" + file_url, file_url)
 
-	# if not, create a File doc from the source presentation's attachment from where this element was copied
-	if not attachment:
-		source_doc = frappe.get_all("File", filters={"file_url": file_url}, limit=1)
-		if source_doc:
-			new_attachment_doc = frappe.copy_doc(frappe.get_doc("File", source_doc[0].name))
-			new_attachment_doc.attached_to_name = presentation
-			new_attachment_doc.insert()
-			attachment = new_attachment_doc.name
+	if not candidates:
+		return {}
 
-	return attachment
+	files = frappe.get_all(
+		"File",
+		filters={"file_url": ["in", list(candidates)], "attached_to_doctype": "Presentation"},
+		fields=[
+			"name",
+			"file_name",
+			"file_url",
+			"is_private",
+			"content_hash",
+			"file_size",
+			"attached_to_name",
+		],
+	)
+
+	readable = {}
+
+	def can_read(source_presentation):
+		if source_presentation not in readable:
+			readable[source_presentation] = bool(
+				frappe.has_permission("Presentation", "read", source_presentation)
+			)
+		return readable[source_presentation]
+
+	attachments, sources = {}, {}
+	for file in files:
+		file_url = candidates[file.file_url]
+		if file.attached_to_name == presentation:
+			attachments[file_url] = file.name
+		elif can_read(file.attached_to_name):
+			sources.setdefault(file_url, file)
+
+	missing = {url: file for url, file in sources.items() if url not in attachments}
+
+	# reuse attachments of the presentation with the same content instead of attaching another copy
+	content_hashes = {file.content_hash for file in missing.values() if file.content_hash}
+	same_content = {}
+	if content_hashes:
+		for file in frappe.get_all(
+			"File",
+			filters={
+				"attached_to_doctype": "Presentation",
+				"attached_to_name": presentation,
+				"content_hash": ["in", list(content_hashes)],
+			},
+			fields=["name", "content_hash", "is_private"],
+		):
+			same_content.setdefault((file.content_hash, file.is_private), file.name)
+
+	to_attach = {}
+	for file_url, file in missing.items():
+		attachment = same_content.get((file.content_hash, file.is_private)) if file.content_hash else None
+		if attachment:
+			attachments[file_url] = attachment
+		else:
+			to_attach[file_url] = file
+
+	# attach the source presentation's file without copying its content
+	unique_sources = {file.name: file for file in to_attach.values()}
+	new_attachments = bulk_attach_file_references(presentation, list(unique_sources.values()))
+
+	for file_url, file in to_attach.items():
+		attachments[file_url] = new_attachments[file.name]
+
+	return attachments
+
+
+def get_pasted_elements(items: list[dict]) -> list[dict]:
+	"""
+	Returns pasted elements from a list of elements or a list of slides with their elements.
+	"""
+	elements = []
+	for item in items:
+		if "elements" in item:
+			if isinstance(item["elements"], str):
+				item["elements"] = load_elements(item["elements"])
+			elements.extend(item["elements"])
+		else:
+			elements.append(item)
+
+	return elements
 
 
 @frappe.whitelist()
 def get_updated_json(presentation, json):
-	for element in json:
-		if element.get("type") in ["image", "video"]:
-			file_url = element.get("src").replace(frappe.local.site_name, "")
-			name = get_attachment(presentation, file_url)
-			element["attachmentName"] = name
+	"""
+	Attaches media of elements pasted from another presentation and updates their attachment names
+	- json: list of elements, or list of slides with their elements for a multi-slide clipboard
+	"""
+	frappe.has_permission("Presentation", "write", presentation, throw=True)
+
+	json = frappe.parse_json(json)
+	media_elements = [
+		element for element in get_pasted_elements(json) if element.get("type") in ["image", "video"]
+	]
+
+	file_urls = {element.get("src", "").replace(frappe.local.site_name, "") for element in media_elements}
+	attachments = resolve_attachments(presentation, file_urls - {""})
+
+	for element in media_elements:
+		file_url = element.get("src", "").replace(frappe.local.site_name, "")
+		element["attachmentName"] = attachments.get(file_url)
 
 	return json
 
@@ -248,116 +708,105 @@ def get_layouts(theme):
 	}
 
 
+def on_doctype_update():
+	# owner and template lookups are separate indexes so that the permission
+	# condition below can be resolved with an index union, both sorted by modified
+	frappe.db.add_index("Presentation", ["owner", "is_template", "modified"])
+	frappe.db.add_index("Presentation", ["is_template", "modified"])
+
+
+@request_cache
+def get_user_roles(user: str) -> set[str]:
+	return set(frappe.get_roles(user))
+
+
 def get_permission_query_conditions(user):
+	user = user or frappe.session.user
 	if user == "Administrator":
 		return ""
 
 	if frappe.has_permission("Presentation", "read", user=user):
-		return f"`tabPresentation`.owner = '{user}' OR `tabPresentation`.is_template = 1"
+		return f"(`tabPresentation`.owner = {frappe.db.escape(user)} OR `tabPresentation`.is_template = 1)"
 
 
 def has_permission(doc, ptype="read", user=None):
+	user = user or frappe.session.user
 	if user == "Administrator":
 		return True
 
-	user_roles = set(frappe.get_roles(user))
-
-	if "Slides User" in user_roles:
+	if "Slides User" in get_user_roles(user):
 		return doc.owner == user or (doc.is_template and ptype == "read")
 
 	return False
 
 
-def exists_in_public_folder(file_name):
-	return frappe.db.exists("File", {"file_name": file_name, "is_private": 0})
-
-
-def create_attachment_with_unique_name(doc):
-	import os
-
-	file_name = doc.file_name
-	file_extension = os.path.splitext(file_name)[1]
-	base_name = os.path.splitext(file_name)[0]
-	unique_name = f"{base_name}_{uuid.uuid4().hex[:6]}{file_extension}"
-
-	file_content = doc.get_content()
-	new_file_doc = frappe.get_doc(
-		{
-			"doctype": "File",
-			"file_name": unique_name,
-			"file_url": f"/files/{unique_name}",
-			"attached_to_doctype": doc.attached_to_doctype,
-			"attached_to_name": doc.attached_to_name,
-			"is_private": 0,
-			"content": file_content,
-		}
-	)
-
-	new_file_doc.insert()
-
-	return new_file_doc
-
-
-def get_updated_elements(presentation_name, old_file_name, new_file_doc):
-	presentation = frappe.get_doc("Presentation", presentation_name)
-	updated_slides = []
-
-	for slide in presentation.slides:
-		elements = json.loads(slide.elements or "[]")
-
-		for element in elements:
-			if element.get("type") in ["image", "video"]:
-				if element.get("attachmentName") == old_file_name:
-					element["attachmentName"] = new_file_doc.name
-					element["src"] = new_file_doc.file_url.replace(frappe.local.site_name, "")
-
-		slide.elements = json.dumps(elements, indent=2)
-		updated_slides.append(slide)
-
-	return updated_slides
-
-
 @frappe.whitelist()
 def set_public(name, is_public):
-	presentation_doc = frappe.get_doc("Presentation", name)
-
-	attachments = frappe.get_all(
-		"File", filters={"attached_to_name": name, "attached_to_doctype": "Presentation"}, pluck="name"
+	"""
+	Enqueues making the presentation and its attachments public or private.
+	Progress is published over realtime as `slides:set_public` and can be polled with `get_sharing_status`.
+	"""
+	from frappe.utils.background_jobs import is_job_enqueued
+
+	from slides.api.sharing import set_sharing_status
+
+	frappe.has_permission("Presentation", "write", name, throw=True)
+
+	job_id = f"slides:set_public:{name}"
+	if is_job_enqueued(job_id):
+		frappe.throw("The access level of this presentation is already being changed")
+
+	is_public = cint(is_public)
+	# reset the status so that pollers do not pick up the result of a previous run
+	set_sharing_status(name, {"progress": 0, "total": 0, "is_public": is_public})
+	job = frappe.enqueue(
+		"slides.api.sharing.set_presentation_access",
+		queue="long",
+		job_id=job_id,
+		deduplicate=True,
+		name=name,
+		is_public=is_public,
 	)
+	if not job:
+		frappe.throw("The access level of this presentation is already being changed")
 
-	slides = []
-
-	for attachment in attachments:
-		attachment_doc = frappe.get_doc("File", attachment)
-		if is_public and exists_in_public_folder(attachment_doc.file_name):
-			unique_attachment = create_attachment_with_unique_name(attachment_doc)
-			attachment_doc.delete()
-			slides = get_updated_elements(name, attachment_doc.name, unique_attachment)
-		else:
-			attachment_doc.is_private = not is_public
-			attachment_doc.save()
-
-	presentation_doc.is_public = is_public
+	return {"is_public": is_public}
 
-	if len(slides):
-		presentation_doc.slides = slides
 
-	presentation_doc.save()
+@frappe.whitelist()
+def get_sharing_status(name):
+	from slides.api.sharing import get_sharing_status
 
-	return {
-		"slides": presentation_doc.slides,
-		"to_update": len(slides),
-	}
+	frappe.has_permission("Presentation", "read", name, throw=True)
+	return get_sharing_status(name)
 
 
 @frappe.whitelist(allow_guest=True)
 def is_public_presentation(name):
-	return frappe.db.get_value("Presentation", name, "is_public") == 1
+	meta = get_presentation_meta(name)
+	return bool(meta and meta.is_public)
 
 
 @frappe.whitelist(allow_guest=True)
 def is_composite_presentation(name):
-	return frappe.db.get_value("Presentation", name, "is_composite") == 1
+	meta = get_presentation_meta(name)
+	return bool(meta and meta.is_composite)
+
+
+@frappe.whitelist(allow_guest=True)
+def get_presentation_access(name):
+	"""
+	Returns whether the presentation is public or composite and if the session user can edit it.
+	"""
+	meta = get_presentation_meta(name)
+	if not meta:
+		return {"is_public": False, "is_composite": False, "can_write": False}
+
+	return {
+		"is_public": bool(meta.is_public),
+		"is_composite": bool(meta.is_composite),
+		"can_write": has_meta_permission(meta, "write"),
+	}
 
 
 @frappe.whitelist(allow_guest=True)
@@ -377,87 +826,230 @@ def get_themes():
 		order_by="title",
 	)
 
+	thumbnail_index = {theme["name"]: 3 if theme["title"] in ("Light", "Dark") else 1 for theme in themes}
+	thumbnails = get_presentation_thumbnails(thumbnail_index)
 	for theme in themes:
-		if theme["title"] in ("Light", "Dark"):
-			theme["thumbnail"] = get_presentation_thumbnail(theme["name"], 3)
-		else:
-			theme["thumbnail"] = get_presentation_thumbnail(theme["name"])
+		theme["thumbnail"] = thumbnails.get(theme["name"])
 
 	return themes
 
 
-@frappe.whitelist(allow_guest=True)
-def get_composite_presentation(name):
-	doc = frappe.get_doc("Presentation", name)
+COMPOSITE_CACHE_KEY = "slides:composite_presentation"
+SLIDE_VIEW_FIELDS = [
+	"name",
+	"parent",
+	"idx",
+	"background",
+	"elements",
+	"thumbnail",
+	"transition",
+	"transition_duration",
+]
 
-	composite_slides = []
 
-	for reference in doc.reference_presentations:
-		ref_doc = frappe.get_cached_doc("Presentation", reference.presentation)
-		for slide in ref_doc.slides:
-			composite_slides.append(slide)
+def get_composite_signature(name: str) -> tuple[str, list[str]]:
+	"""
+	Returns a signature of the composite presentation and its references based on when they were modified,
+	along with the list of referenced presentations in order.
+	"""
+	Presentation = frappe.qb.DocType("Presentation")
+	Reference = frappe.qb.DocType("Reference Presentation")
+
+	references = (
+		frappe.qb.from_(Reference)
+		.join(Presentation)
+		.on(Reference.presentation == Presentation.name)
+		.select(Reference.presentation, Presentation.modified)
+		.where(Reference.parent == name)
+		.where(Reference.parenttype == "Presentation")
+		.orderby(Reference.idx)
+		.run()
+	)
+	modified = frappe.db.get_value("Presentation", name, "modified")
 
-	doc.slides = composite_slides
+	signature = "|".join(f"{ref}:{ref_modified}" for ref, ref_modified in [(name, modified), *references])
+	return signature, [ref for ref, _ in references]
 
-	return doc.as_dict()
 
+def build_composite_presentation(name: str, references: list[str]) -> dict:
+	"""
+	Returns the composite presentation with slides of all its references in order.
+	"""
+	presentation = frappe.get_doc("Presentation", name).as_dict()
 
-def can_convert_image(extn):
-	return extn.lower() in ["png", "jpeg", "jpg"]
+	slides = frappe.get_all(
+		"Slide",
+		filters={"parent": ["in", references], "parenttype": "Presentation"},
+		fields=SLIDE_VIEW_FIELDS,
+		order_by="idx",
+	)
 
+	slides_by_reference = {}
+	for slide in slides:
+		slides_by_reference.setdefault(slide.parent, []).append(slide)
 
-def convert_and_save_image(image, path):
-	image.save(path, "WEBP")
-	return path
+	presentation["slides"] = [slide for ref in references for slide in slides_by_reference.get(ref, [])]
+	return presentation
 
 
-def create_new_webp_file_doc(presentation, file_url, image, extn):
-	files = frappe.get_all(
-		"File",
-		filters={
-			"attached_to_name": presentation,
-			"file_url": file_url,
-		},
-		fields=["name"],
-		limit=1,
+def get_cached_composite_presentation(name: str) -> dict:
+	"""
+	Returns the composite presentation from cache, rebuilding it if it or any of its references was modified.
+	"""
+	signature, references = get_composite_signature(name)
+
+	cached = frappe.cache.hget(COMPOSITE_CACHE_KEY, name)
+	if cached and cached["signature"] == signature:
+		return cached["presentation"]
+
+	presentation = build_composite_presentation(name, references)
+	frappe.cache.hset(COMPOSITE_CACHE_KEY, name, {"signature": signature, "presentation": presentation})
+
+	return presentation
+
+
+def clear_composite_cache(presentation: str):
+	"""
+	Clears the cached composite presentations that include the presentation.
+	"""
+	composites = frappe.get_all(
+		"Reference Presentation",
+		filters={"presentation": presentation, "parenttype": "Presentation"},
+		pluck="parent",
 	)
-	if files:
-		_file = frappe.get_doc("File", files[0].name)
-		webp_path = _file.get_full_path().replace(extn, "webp")
-		convert_and_save_image(image, webp_path)
-		new_file = frappe.copy_doc(_file)
-		new_file.file_name = f"{_file.file_name.replace(extn, 'webp')}"
-		new_file.file_url = f"{_file.file_url.replace(extn, 'webp')}"
-		new_file.save()
-		return new_file.file_url
-	return file_url
+	for composite in {presentation, *composites}:
+		frappe.cache.hdel(COMPOSITE_CACHE_KEY, composite)
 
 
-def update_element_urls(is_public, presentation, element):
-	attribute = "poster" if element.get("type") == "video" else "src"
-	image_url = element.get(attribute, "") if is_public else f"/private{element.get(attribute, '')}"
+@frappe.whitelist(allow_guest=True)
+def get_composite_presentation(name, include_thumbnails=1):
+	meta = get_presentation_meta(name)
+	if not meta or not meta.is_composite:
+		frappe.throw("Composite presentation not found", frappe.DoesNotExistError)
 
-	if image_url.endswith((".webp", ".svg")):
-		return
+	if not meta.is_public and not has_meta_permission(meta, "read"):
+		frappe.throw("Presentation is not public", frappe.PermissionError)
 
-	image, filename, extn = get_local_image(image_url)
+	presentation = get_cached_composite_presentation(name)
 
-	if can_convert_image(extn):
-		new_url = create_new_webp_file_doc(presentation, image_url, image, extn)
-		element[attribute] = new_url.replace("/private", "")
+	if cint(include_thumbnails):
+		return presentation
 
+	return {
+		**presentation,
+		"slides": [{**slide, "thumbnail": None} for slide in presentation["slides"]],
+	}
 
-@frappe.whitelist()
-def optimize_images(name):
-	doc = frappe.get_doc("Presentation", name)
 
-	for slide in doc.slides:
-		elements = json.loads(slide.elements or "[]")
+SLIDE_WINDOW = 10
+MAX_SLIDE_WINDOW = 50
+PRESENTATION_VIEW_FIELDS = ["name", "title", "slug", "theme", "is_public", "is_composite", "modified"]
 
-		for element in elements:
-			if element.get("type") in ["image", "video"]:
-				update_element_urls(doc.is_public, doc.name, element)
 
-		slide.elements = json.dumps(elements, indent=2)
+@frappe.whitelist(allow_guest=True)
+def get_presentation_slides(name, start=0, page_length=SLIDE_WINDOW, include_thumbnails=1):
+	"""
+	Returns presentation details along with a window of its slides for viewing
+	- start: index of the first slide in the window
+	- page_length: number of slides in the window
+	"""
+	meta = get_presentation_meta(name)
+	if not meta:
+		frappe.throw("Presentation not found", frappe.DoesNotExistError)
+
+	presentation = frappe._dict({field: meta[field] for field in PRESENTATION_VIEW_FIELDS})
+
+	if not presentation.is_public and not has_meta_permission(meta, "read"):
+		frappe.throw("Presentation is not public", frappe.PermissionError)
+
+	start = max(cint(start), 0)
+	page_length = min(cint(page_length) or SLIDE_WINDOW, MAX_SLIDE_WINDOW)
+
+	if presentation.is_composite:
+		composite_slides = get_cached_composite_presentation(name)["slides"]
+		total = len(composite_slides)
+		slides = composite_slides[start : start + page_length]
+	else:
+		total = meta.slide_count
+		slides = frappe.get_all(
+			"Slide",
+			filters={"parent": name, "parenttype": "Presentation"},
+			fields=SLIDE_VIEW_FIELDS,
+			order_by="idx",
+			limit_start=start,
+			limit_page_length=page_length,
+		)
+
+	if not cint(include_thumbnails):
+		slides = [{**slide, "thumbnail": None} for slide in slides]
+
+	return {
+		"presentation": presentation,
+		"start": start,
+		"total": total,
+		"slides": slides,
+	}
+
+
+# how long guests and proxies may reuse the bootstrap of a public presentation
+# unless overridden by `slides_bootstrap_max_age` in site config
+DEFAULT_BOOTSTRAP_MAX_AGE = 60
+
 
-	return doc.save()
+@frappe.whitelist(allow_guest=True, methods=["GET"])
+def get_presentation_bootstrap(name):
+	"""
+	Returns the access level of the presentation along with its details and first window of slides,
+	so that a shared presentation can be viewed with a single request.
+	Responses to guests for public presentations can be cached by browsers and proxies.
+	"""
+	meta = get_presentation_meta(name)
+	access = get_presentation_access(name)
+	bootstrap = {"access": access}
+
+	if meta and (meta.is_public or has_meta_permission(meta, "read")):
+		bootstrap.update(get_presentation_slides(name))
+
+	return get_viewer_response(bootstrap, access["is_public"])
+
+
+@frappe.whitelist(allow_guest=True, methods=["GET"])
+def get_slide_window(name, start=0):
+	"""
+	Returns a window of slides for viewing, cacheable the same way as the bootstrap.
+	"""
+	window = get_presentation_slides(name, start)
+	return get_viewer_response(window, window["presentation"].is_public)
+
+
+def get_viewer_response(data: dict, is_public: bool) -> Response:
+	"""
+	Returns the data as a JSON response with an ETag.
+	Responses to guests for public presentations can be cached by browsers and proxies.
+	"""
+	response = Response(frappe.as_json({"message": data}), mimetype="application/json")
+	if frappe.session.user == "Guest" and is_public:
+		max_age = cint(frappe.conf.get("slides_bootstrap_max_age") or DEFAULT_BOOTSTRAP_MAX_AGE)
+		response.headers["Cache-Control"] = f"public, max-age={max_age}"
+	else:
+		response.headers["Cache-Control"] = "private, no-cache"
+
+	response.add_etag()
+	return response.make_conditional(frappe.request)
+
+
+@frappe.whitelist()
+def optimize_images(name):
+	"""
+	Enqueues conversion of images in the presentation to WEBP.
+	Progress is published over realtime as `slides:optimize_images`.
+	"""
+	frappe.has_permission("Presentation", "write", name, throw=True)
+
+	frappe.enqueue(
+		"slides.api.image.optimize_presentation_images",
+		queue="long",
+		job_id=f"slides:optimize_images:{name}",
+		deduplicate=True,
+		name=name,
+	)
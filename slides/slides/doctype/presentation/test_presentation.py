@@ -1,9 +1,125 @@
 # Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime
+
+from slides.slides.doctype.presentation.presentation import save_base64_thumbnail, save_slides
+
+# 1x1 transparent png
+THUMBNAIL = (
+	"data:image/png;base64,"
+	"iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+
+def create_presentation(slide_count: int = 3):
+	return frappe.get_doc(
+		{
+			"doctype": "Presentation",
+			"title": "Test Save Slides",
+			"slides": [{"elements": "[]"} for _ in range(slide_count)],
+		}
+	).insert()
+
+
+def get_slide_names(presentation: str) -> list[str]:
+	return frappe.get_all(
+		"Slide",
+		filters={"parent": presentation, "parenttype": "Presentation"},
+		order_by="idx asc",
+		pluck="name",
+	)
+
+
+def get_modified(presentation: str) -> str:
+	return str(frappe.db.get_value("Presentation", presentation, "modified"))
 
 
 class TestPresentation(FrappeTestCase):
-	pass
+	def test_stale_modified_is_rejected(self):
+		presentation = create_presentation()
+		stale = add_to_date(presentation.modified, seconds=-1)
+
+		with self.assertRaises(frappe.TimestampMismatchError):
+			save_slides(presentation.name, str(stale), deleted=[presentation.slides[0].name])
+
+		# nothing is written
+		self.assertEqual(len(get_slide_names(presentation.name)), 3)
+
+	def test_modified_is_returned_for_next_save(self):
+		presentation = create_presentation()
+
+		result = save_slides(presentation.name, str(presentation.modified), order=[])
+		self.assertEqual(get_datetime(result["modified"]), get_datetime(get_modified(presentation.name)))
+
+		# the returned timestamp is accepted by the next save
+		save_slides(presentation.name, result["modified"], order=[])
+
+	def test_delete_and_reorder(self):
+		presentation = create_presentation()
+		first, second, third = (slide.name for slide in presentation.slides)
+
+		save_slides(
+			presentation.name,
+			str(presentation.modified),
+			deleted=[first],
+			order=[{"name": third, "idx": 1}, {"name": second, "idx": 2}],
+		)
+
+		self.assertEqual(get_slide_names(presentation.name), [third, second])
+
+	def test_new_and_changed_slides(self):
+		presentation = create_presentation(slide_count=1)
+		existing = presentation.slides[0].name
+
+		result = save_slides(
+			presentation.name,
+			str(presentation.modified),
+			slides=[
+				{"name": existing, "idx": 1, "background": "#000000"},
+				{"idx": 2, "elements": "[]"},
+			],
+		)
+
+		names = get_slide_names(presentation.name)
+		self.assertEqual(len(names), 2)
+		self.assertEqual(names[0], existing)
+		self.assertEqual([slide["name"] for slide in result["slides"]], names)
+		self.assertEqual(frappe.db.get_value("Slide", existing, "background"), "#000000")
+
+	def test_slide_of_another_presentation_is_rejected(self):
+		presentation = create_presentation()
+		other = create_presentation()
+
+		with self.assertRaises(frappe.ValidationError):
+			save_slides(presentation.name, str(presentation.modified), deleted=[other.slides[0].name])
+
+		self.assertEqual(len(get_slide_names(other.name)), 3)
+
+	def test_shared_thumbnail_is_kept_while_in_use(self):
+		presentation = create_presentation(slide_count=2)
+		thumbnail = save_base64_thumbnail(THUMBNAIL, presentation.name, "thumbnail", False)
+
+		# a duplicated slide shares the thumbnail file of the slide it was copied from
+		for slide in presentation.slides:
+			frappe.db.set_value("Slide", slide.name, "thumbnail", thumbnail)
+
+		def thumbnail_exists():
+			return frappe.db.exists(
+				"File",
+				{
+					"attached_to_doctype": "Presentation",
+					"attached_to_name": presentation.name,
+					"file_url": thumbnail,
+				},
+			)
+
+		first, second = (slide.name for slide in presentation.slides)
+
+		result = save_slides(presentation.name, get_modified(presentation.name), deleted=[first])
+		self.assertTrue(thumbnail_exists())
+
+		save_slides(presentation.name, result["modified"], deleted=[second])
+		self.assertFalse(thumbnail_exists())
@@ -0,0 +1,16 @@
+# Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class PresentationSearchTerm(Document):
+	pass
+
+
+def on_doctype_update():
+	# terms are looked up first and then grouped by presentation,
+	# slides are reindexed by deleting their rows
+	frappe.db.add_index("Presentation Search Term", ["term", "presentation"])
+	frappe.db.add_index("Presentation Search Term", ["presentation", "slide"])
@@ -1,9 +1,14 @@
 # Copyright (c) 2024, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
 
 class Slide(Document):
 	pass
+
+
+def on_doctype_update():
+	# slides are always read in order for a presentation
+	frappe.db.add_index("Slide", ["parent", "idx"])
@@ -0,0 +1,76 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from slides.migration import get_cursor_key, migrate_slides
+
+PATCH = "test_migrate_slides"
+
+
+class TestMigrateSlides(FrappeTestCase):
+	def setUp(self):
+		self.presentation = frappe.get_doc(
+			{
+				"doctype": "Presentation",
+				"title": "Test Migrate Slides",
+				"slides": [{"background": "#ffffff"} for _ in range(3)],
+			}
+		).insert()
+		self.slides = sorted(slide.name for slide in self.presentation.slides)
+
+		# migrations commit each batch, so the test data has to be removed explicitly
+		self.addCleanup(frappe.db.commit)
+		self.addCleanup(frappe.delete_doc, "Presentation", self.presentation.name, force=True)
+		self.addCleanup(frappe.db.set_global, get_cursor_key(PATCH), None)
+
+	def get_backgrounds(self) -> dict:
+		return dict(
+			frappe.get_all(
+				"Slide",
+				filters={"parent": self.presentation.name},
+				fields=["name", "background"],
+				as_list=True,
+			)
+		)
+
+	def test_transform_changes_are_written(self):
+		def transform(slide):
+			if slide.name in self.slides:
+				return {"background": "#000000"}
+
+		result = migrate_slides(PATCH, transform, fields=("background",))
+
+		self.assertGreaterEqual(result.updated, 3)
+		self.assertEqual(set(self.get_backgrounds().values()), {"#000000"})
+		self.assertIsNone(frappe.db.get_global(get_cursor_key(PATCH)))
+
+	def test_interrupted_migration_resumes_after_last_batch(self):
+		first, failing, last = self.slides
+
+		def failing_transform(slide):
+			if slide.name == failing:
+				raise Exception("interrupted")
+			if slide.name in self.slides:
+				return {"background": "#000000"}
+
+		with self.assertRaises(Exception):
+			migrate_slides(PATCH, failing_transform, fields=("background",), batch_size=1)
+
+		# the batches before the failure were committed along with the cursor
+		cursor = frappe.db.get_global(get_cursor_key(PATCH))
+		self.assertTrue(first <= cursor < failing)
+		self.assertEqual(self.get_backgrounds()[first], "#000000")
+
+		seen = []
+
+		def transform(slide):
+			seen.append(slide.name)
+			if slide.name in self.slides:
+				return {"background": "#000000"}
+
+		migrate_slides(PATCH, transform, fields=("background",), batch_size=1)
+
+		self.assertNotIn(first, seen)
+		self.assertIn(failing, seen)
+		self.assertTrue(all(name > cursor for name in seen))
+		self.assertEqual(set(self.get_backgrounds().values()), {"#000000"})
+		self.assertIsNone(frappe.db.get_global(get_cursor_key(PATCH)))
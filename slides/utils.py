@@ -0,0 +1,26 @@
+import json
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+
+def dump_elements(elements: list[dict]) -> str:
+	"""
+	Returns the compact JSON representation of slide elements used for storage.
+	"""
+	if orjson:
+		return orjson.dumps(elements).decode()
+
+	return json.dumps(elements, separators=(",", ":"), ensure_ascii=False)
+
+
+def load_elements(elements: str | None) -> list[dict]:
+	"""
+	Returns the list of slide elements from its stored JSON representation.
+	"""
+	if orjson:
+		return orjson.loads(elements or "[]")
+
+	return json.loads(elements or "[]")